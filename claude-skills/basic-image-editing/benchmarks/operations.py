@@ -0,0 +1,211 @@
+#!/usr/bin/env -S uv run
+# /// script
+# requires-python = ">=3.10"
+# dependencies = ["pillow", "pillow-heif", "numpy"]
+# ///
+"""Benchmark image_edit.py operations and encoders across image sizes and modes.
+
+Generates synthetic images (smooth gradients with mild noise and, for RGBA, a
+transparent border), times each operation and encoder path, and records median
+time, throughput and peak memory. Results can be saved as a baseline and later
+runs compared against it.
+
+Usage:
+    uv run benchmarks/operations.py --sizes 1,12 --output results.json
+    uv run benchmarks/operations.py --sizes 1,12 --baseline results.json
+"""
+
+import argparse
+import io
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+import image_edit  # noqa: E402
+
+DEFAULT_SIZES = "1,12,50,100"
+DEFAULT_MODES = "L,RGB,RGBA"
+
+
+def _encode(img: Image.Image, fmt: str, **save_kwargs) -> int:
+    """Encode to memory the way image_edit saves, returning the encoded size."""
+    img, defaults = image_edit.prepare_for_save(img, fmt)
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **{**defaults, **save_kwargs})
+    return buffer.tell()
+
+
+# name -> (function(img, mask, megapixels), modes it applies to)
+OPERATIONS = {
+    "rotate90": (lambda img, mask, mp: image_edit.rotate_image(img, 90), None),
+    "rotate30": (lambda img, mask, mp: image_edit.rotate_image(img, 30), None),
+    "resize": (lambda img, mask, mp: image_edit.resize_image(img, width=img.size[0] // 2), None),
+    "pad": (lambda img, mask, mp: image_edit.pad_image(img, 64, 64, 64, 64, color=255 if img.mode == "L" else None),
+            None),
+    "pad_edge": (lambda img, mask, mp: image_edit.pad_image(img, 64, 64, 64, 64, edge=True), None),
+    "alpha_blend": (lambda img, mask, mp: image_edit.alpha_blend(img, mask), ("RGB", "RGBA")),
+    "autocrop": (lambda img, mask, mp: image_edit.autocrop_transparency(img, 5), ("RGBA",)),
+    "remove_transparency": (lambda img, mask, mp: image_edit.handle_transparency(img), ("RGBA",)),
+    "reduce_file_size": (lambda img, mask, mp: image_edit.reduce_file_size(img, mp * 0.1, "JPEG"), None),
+    "encode_jpeg": (lambda img, mask, mp: _encode(img, "JPEG"), None),
+    "encode_png": (lambda img, mask, mp: _encode(img, "PNG"), None),
+    "encode_webp": (lambda img, mask, mp: _encode(img, "WEBP", method=6), None),
+    "encode_heif": (lambda img, mask, mp: _encode(img, "HEIF"), None),
+}
+
+
+def make_image(megapixels: float, mode: str, seed: int = 0) -> tuple[Image.Image, Image.Image]:
+    """Build a 4:3 synthetic image and a matching L mask.
+
+    Gradients plus mild noise compress like photographs rather than like pure
+    noise; RGBA images get a fully transparent 5% border for autocrop.
+    """
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    rng = np.random.default_rng(seed)
+
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    channels = []
+    for weight in (0.6, 0.3, 0.8):
+        channel = weight * x + (1 - weight) * y + rng.normal(0, 6, (height, width)).astype(np.float32)
+        channels.append(np.clip(channel, 0, 255).astype(np.uint8))
+
+    if mode == "L":
+        img = Image.fromarray(channels[0], "L")
+    elif mode == "RGB":
+        img = Image.fromarray(np.dstack(channels), "RGB")
+    else:
+        alpha = np.zeros((height, width), dtype=np.uint8)
+        alpha[height // 20:-height // 20, width // 20:-width // 20] = 255
+        img = Image.fromarray(np.dstack(channels + [alpha]), "RGBA")
+
+    mask = Image.fromarray(channels[1], "L")
+    return img, mask
+
+
+def _reset_peak_rss():
+    """Reset the kernel's peak-RSS counter where supported (Linux)."""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size in MB (since the last reset on Linux)."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(fn, img: Image.Image, mask: Image.Image, megapixels: float, repeat: int) -> dict:
+    """Time fn over repeat runs and report median seconds, throughput and peak memory."""
+    timings = []
+    _reset_peak_rss()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(img, mask, megapixels)
+        timings.append(time.perf_counter() - start)
+    seconds = statistics.median(timings)
+    return {
+        'seconds': seconds,
+        'mp_per_s': megapixels / seconds if seconds else float('inf'),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> bool:
+    """Print per-case ratios against a baseline; return True if any case regressed."""
+    previous = {r['case']: r for r in baseline}
+    regressed = False
+    print(f"\n{'case':<36}{'baseline s':>12}{'current s':>12}{'ratio':>8}")
+    for result in results:
+        base = previous.get(result['case'])
+        if base is None:
+            continue
+        ratio = result['seconds'] / base['seconds'] if base['seconds'] else float('inf')
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressed = True
+        elif ratio < 1 - tolerance:
+            flag = "  faster"
+        print(f"{result['case']:<36}{base['seconds']:>12.4f}{result['seconds']:>12.4f}{ratio:>8.2f}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image_edit.py operations and encoders")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"Comma-separated image sizes in megapixels (default: {DEFAULT_SIZES})")
+    parser.add_argument("--modes", default=DEFAULT_MODES,
+                        help=f"Comma-separated image modes (default: {DEFAULT_MODES})")
+    parser.add_argument("--ops", default=",".join(OPERATIONS),
+                        help="Comma-separated operations (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median is kept (default: 3)")
+    parser.add_argument("--output", "-o", help="Write results to this JSON file")
+    parser.add_argument("--baseline", "-b", help="Compare against a previously saved results file")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative slowdown vs baseline that counts as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    ops = [op.strip() for op in args.ops.split(",")]
+    unknown = [op for op in ops if op not in OPERATIONS]
+    if unknown:
+        parser.error(f"Unknown operations: {', '.join(unknown)}")
+    if "encode_heif" in ops:
+        image_edit._register_heif()
+
+    results = []
+    print(f"{'case':<36}{'median s':>10}{'MP/s':>10}{'peak MB':>10}")
+    for megapixels in [float(s) for s in args.sizes.split(",")]:
+        for mode in [m.strip() for m in args.modes.split(",")]:
+            img, mask = make_image(megapixels, mode)
+            for op in ops:
+                fn, modes = OPERATIONS[op]
+                if modes is not None and mode not in modes:
+                    continue
+                case = f"{op}/{megapixels:g}MP/{mode}"
+                try:
+                    result = run_case(fn, img, mask, megapixels, args.repeat)
+                except (ValueError, OSError) as e:
+                    print(f"{case:<36}  skipped: {e}")
+                    continue
+                result = {'case': case, 'op': op, 'megapixels': megapixels, 'mode': mode, **result}
+                results.append(result)
+                print(f"{case:<36}{result['seconds']:>10.4f}{result['mp_per_s']:>10.1f}{result['peak_rss_mb']:>10.1f}")
+            del img, mask
+
+    if args.output:
+        report = {
+            'python': platform.python_version(),
+            'pillow': Image.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'results': results,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nResults: {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())['results']
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
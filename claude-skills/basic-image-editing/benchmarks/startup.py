@@ -0,0 +1,85 @@
+#!/usr/bin/env -S uv run
+# /// script
+# requires-python = ">=3.10"
+# dependencies = ["pillow", "pillow-heif", "numpy"]
+# ///
+"""Startup-time benchmark guarding the image_edit.py import budget.
+
+Runs short PNG/JPEG jobs in fresh interpreters and fails if numpy or pillow_heif
+get imported, or if the median wall time exceeds the budget.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+
+# Modules that must stay unloaded for plain PNG/JPEG geometry jobs
+LAZY_MODULES = ("numpy", "pillow_heif")
+
+# Imports image_edit, optionally runs one CLI job, then reports which lazy modules were loaded
+JOB_SNIPPET = """
+import json, sys
+sys.path.insert(0, {scripts_dir!r})
+import image_edit
+if {argv!r} is not None:
+    image_edit.main({argv!r})
+print(json.dumps(sorted(m for m in {lazy!r} if m in sys.modules)))
+"""
+
+JOBS = {
+    "import": None,
+    "png-rotate": ["{tmp}/input.png", "-o", "{tmp}/rotated.png", "--rotate", "90"],
+    "jpeg-resize": ["{tmp}/input.jpg", "-o", "{tmp}/resized.jpg", "--width", "320"],
+}
+
+
+def run_job(argv: list[str] | None) -> tuple[float, list[str]]:
+    """Run a job in a fresh interpreter, returning (seconds, loaded lazy modules)."""
+    code = JOB_SNIPPET.format(scripts_dir=str(SCRIPTS_DIR), argv=argv, lazy=LAZY_MODULES)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guard the image_edit.py startup/import budget")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per job (default: 10)")
+    parser.add_argument("--budget-ms", type=float, default=250,
+                        help="Maximum median wall time per job in ms (default: 250)")
+    args = parser.parse_args()
+
+    from PIL import Image
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        Image.new("RGB", (640, 480), (200, 100, 50)).save(f"{tmp}/input.png")
+        Image.new("RGB", (640, 480), (200, 100, 50)).save(f"{tmp}/input.jpg")
+
+        print(f"{'job':<14}{'median ms':>12}{'min ms':>10}  lazy modules loaded")
+        for name, template in JOBS.items():
+            argv = None if template is None else [a.format(tmp=tmp) for a in template]
+            timings, loaded = [], []
+            for _ in range(args.runs):
+                elapsed, loaded = run_job(argv)
+                timings.append(elapsed * 1000)
+            median = statistics.median(timings)
+            print(f"{name:<14}{median:>12.1f}{min(timings):>10.1f}  {', '.join(loaded) or '-'}")
+            if loaded or median > args.budget_ms:
+                failed = True
+
+    if failed:
+        print(f"FAIL: budget is {args.budget_ms:.0f} ms with none of {', '.join(LAZY_MODULES)} imported")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
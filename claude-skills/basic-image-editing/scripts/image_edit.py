@@ -5,22 +5,443 @@
 # ///
 """Basic image editing operations: rotate, flip, resize, transparency, padding, cropping, conversion, and more."""
 
+from __future__ import annotations
+
 import argparse
+import contextlib
+import hashlib
 import io
+import json
 import os
 import sys
+import threading
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def submit_job(socket_path: str, argv: list[str]) -> int | None:
+    """Send a job to a worker daemon and print its output.
+    
+    Returns:
+        The job's exit code, or None if no daemon is listening on socket_path
+        or it sent no valid reply.
+    """
+    import socket
+    
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return None
+    
+    try:
+        with client, client.makefile("rwb") as stream:
+            stream.write(json.dumps({"argv": argv, "cwd": os.getcwd()}).encode() + b"\n")
+            stream.flush()
+            reply = json.loads(stream.readline())
+        output, returncode = reply["output"], reply["returncode"]
+    except (OSError, ValueError, TypeError, KeyError):
+        return None  # No usable reply (e.g. the daemon is shutting down): run locally
+    
+    print(output, end="")
+    return returncode
+
+
+def _client_socket(argv: list[str]) -> tuple[str | None, list[str]]:
+    """The worker socket a command line can be handed to before anything else is loaded.
+    
+    Returns the socket (None for streaming ("-"), --serve and --help calls, which
+    always run in this process) and the job's arguments without --socket.
+    """
+    if any(arg in ("-", "-h", "--help") or arg.startswith("--serve") for arg in argv):
+        return None, argv
+    socket_path = os.environ.get("IMAGE_EDIT_SOCKET")
+    job_argv = []
+    args = iter(argv)
+    for arg in args:
+        name, equals, value = arg.partition("=")
+        if len(name) > 3 and "--socket".startswith(name):  # argparse accepts unique prefixes ("--sock")
+            socket_path = value if equals else next(args, None)
+        else:
+            job_argv.append(arg)
+    return socket_path, job_argv
+
+
+# Thin client: hand the job to a running worker daemon before importing Pillow or
+# building the parser (the worker validates the arguments and reports errors)
+if __name__ == "__main__" and (_client := _client_socket(sys.argv[1:]))[0]:
+    _returncode = submit_job(*_client)
+    if _returncode is not None:
+        sys.exit(_returncode)
+
+from PIL import Image, ImageColor, UnidentifiedImageError  # noqa: E402
+
+# numpy and pillow_heif are imported lazily: most calls (PNG/JPEG rotate, resize,
+# crop) need neither, and together they dominate interpreter startup.
+HEIF_SUFFIXES = ('.heic', '.heif')
+_heif_registered = False
+
+# Input/output path meaning stdin/stdout
+STDIO = "-"
+
+FORMAT_MAP = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+    '.gif': 'GIF',
+    '.webp': 'WEBP',
+    '.tiff': 'TIFF',
+    '.tif': 'TIFF',
+    '.heic': 'HEIF',
+    '.heif': 'HEIF',
+    '.npy': 'NPY',
+    '.raw': 'RAW',
+}
+
+# Pseudo-formats holding decoded pixels rather than an encoded image: NumPy .npy
+# files and headerless C-order uint8 dumps (shape given separately)
+ARRAY_FORMATS = ('NPY', 'RAW')
+ARRAY_SUFFIXES = ('.npy', '.raw')
+NPY_MAGIC = b"\x93NUMPY"
+
+# Output formats that can hold every frame of an animated input
+ANIMATED_FORMATS = ('GIF', 'WEBP', 'PNG')
+
+# Options that configure the daemon itself; a job using them would tie up a pool worker
+DAEMON_OPTIONS = ("--serve", "--workers", "--socket")
+
+# Bump when operation output changes so stale cache entries are never served
+CACHE_VERSION = 1
+
+# Modes that map directly onto uint8 (H, W[, C]) arrays
+_ARRAY_MODES = ("L", "RGB", "RGBA")
+
+
+class Profiler:
+    """Wall/CPU time per named step plus event counters for --profile.
+    
+    Steps with the same name are aggregated, so per-frame work on worker threads
+    adds up under one row. CPU time is process-wide and includes all threads.
+    A disabled profiler records nothing.
+    """
+    
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.steps = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+    
+    @contextlib.contextmanager
+    def step(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            with self._lock:
+                calls, total_wall, total_cpu = self.steps.get(name, (0, 0.0, 0.0))
+                self.steps[name] = (calls + 1, total_wall + wall, total_cpu + cpu)
+    
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+    
+    def report(self) -> dict:
+        return {
+            'steps': [
+                {'step': name, 'calls': calls, 'wall_ms': round(wall * 1000, 3), 'cpu_ms': round(cpu * 1000, 3)}
+                for name, (calls, wall, cpu) in self.steps.items()
+            ],
+            'counters': dict(self.counters),
+            'peak_rss_mb': _peak_rss_mb(),
+        }
+    
+    def print_table(self):
+        report = self.report()
+        print(f"\n{'step':<18}{'calls':>6}{'wall ms':>12}{'cpu ms':>12}")
+        for row in report['steps']:
+            print(f"{row['step']:<18}{row['calls']:>6}{row['wall_ms']:>12.1f}{row['cpu_ms']:>12.1f}")
+        for name, value in report['counters'].items():
+            print(f"{name + ':':<18}{value:>6}")
+        if report['peak_rss_mb'] is not None:
+            print(f"{'peak RSS MB:':<18}{report['peak_rss_mb']:>6.1f}")
+
+
+# Replaced per run by process_image; disabled outside --profile
+_profiler = Profiler()
+
+
+def _peak_rss_mb() -> float | None:
+    """Peak resident set size of this process in MB, if the platform reports it."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
 
-import numpy as np
-import pillow_heif
-from PIL import Image, ImageColor
+def _register_heif():
+    """Register HEIF/HEIC support with Pillow (no-op after the first call)."""
+    global _heif_registered
+    if not _heif_registered:
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+        _heif_registered = True
 
-# Register HEIF/HEIC support
-pillow_heif.register_heif_opener()
+
+def _open_image(source: Path | bytes, raw_shape: tuple = None) -> Image.Image:
+    """Open and load an image from a path or encoded bytes, enabling HEIF support only when it is needed.
+    
+    .npy files (or bytes) and raw arrays (when raw_shape is given) are wrapped by load_array.
+    """
+    if raw_shape is not None or (source[:6] == NPY_MAGIC if isinstance(source, bytes)
+                                 else source.suffix.lower() in ARRAY_SUFFIXES):
+        return load_array(source, raw_shape)
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    elif source.suffix.lower() in HEIF_SUFFIXES:
+        _register_heif()
+    try:
+        img = Image.open(source)
+    except UnidentifiedImageError:
+        # HEIF content behind a non-HEIF extension (or without one)
+        if _heif_registered:
+            raise
+        _register_heif()
+        img = Image.open(source)
+    img.load()
+    return img
+
+
+def parse_shape(value: str) -> tuple[int, ...]:
+    """Parse an array shape such as "480,640,3" or "480x640"."""
+    try:
+        shape = tuple(int(v) for v in value.replace("x", ",").split(","))
+    except ValueError:
+        raise ValueError(f"Invalid shape: {value}")
+    if min(shape) < 1:
+        raise ValueError(f"Invalid shape: {value}")
+    return shape
+
+
+def _array_mode(shape: tuple) -> str:
+    """Image mode for a uint8 array of shape (H, W) or (H, W, 1|3|4)."""
+    channels = 1 if len(shape) == 2 else shape[2] if len(shape) == 3 else None
+    mode = {1: "L", 3: "RGB", 4: "RGBA"}.get(channels)
+    if mode is None:
+        raise ValueError(f"Unsupported array shape {tuple(shape)}: expected (H, W) or (H, W, 1|3|4)")
+    return mode
+
+
+def load_array(source, raw_shape: tuple = None) -> Image.Image:
+    """Wrap a uint8 pixel array as an image, without any decoding.
+    
+    Args:
+        source: An array of shape (H, W) or (H, W, 1|3|4), e.g. one slot of a
+                memmapped dataset; a .npy path (memory-mapped, so only the pages
+                read are loaded) or .npy bytes; or a raw C-order uint8 file/bytes
+        raw_shape: Shape of raw input (required for raw files and bytes)
+    """
+    import numpy as np
+    
+    fmt = None
+    if isinstance(source, (Path, bytes)):
+        is_npy = source[:6] == NPY_MAGIC if isinstance(source, bytes) else source.suffix.lower() == '.npy'
+        fmt = 'NPY' if is_npy else 'RAW'
+        if is_npy:
+            arr = np.load(io.BytesIO(source)) if isinstance(source, bytes) else np.load(source, mmap_mode='r')
+        elif raw_shape is None:
+            raise ValueError("Raw input needs --raw-shape H,W[,C]")
+        elif isinstance(source, bytes):
+            arr = np.frombuffer(source, dtype=np.uint8).reshape(raw_shape)
+        else:
+            arr = np.memmap(source, dtype=np.uint8, mode='r', shape=raw_shape)
+    else:
+        arr = np.asarray(source)
+    
+    if arr.dtype != np.uint8:
+        raise ValueError(f"Array must be uint8, got {arr.dtype}")
+    _array_mode(arr.shape)
+    if arr.ndim == 3 and arr.shape[2] == 1:
+        arr = arr[..., 0]
+    img = Image.fromarray(np.ascontiguousarray(arr))
+    img.format = fmt
+    return img
+
+
+def to_array(img: Image.Image, out: np.ndarray = None) -> np.ndarray:
+    """Pixels of img as a uint8 (H, W) or (H, W, C) array, written into out if given.
+    
+    out is any writable uint8 array, typically one slot of a memmapped
+    (N, H, W, C) dataset. img is converted to out's channel count (transparency
+    is composited onto white for 3 channels) and must match its height and width.
+    Pixels are copied straight from Pillow's buffer; nothing is encoded.
+    
+    Raises:
+        ValueError: out has the wrong dtype, shape or size for img
+    """
+    import numpy as np
+    
+    if out is None:
+        if img.mode not in _ARRAY_MODES:
+            img = img.convert("RGBA" if img.has_transparency_data else "RGB")
+        return np.asarray(img)
+    
+    if out.dtype != np.uint8:
+        raise ValueError(f"Target array must be uint8, got {out.dtype}")
+    mode = _array_mode(out.shape)
+    if img.mode != mode:
+        img = handle_transparency(img) if mode == "RGB" else img.convert(mode)
+    if (img.size[1], img.size[0]) != out.shape[:2]:
+        raise ValueError(f"Result is {img.size[0]}x{img.size[1]} but the target slot is "
+                         f"{out.shape[1]}x{out.shape[0]}")
+    out[...] = np.asarray(img).reshape(out.shape)
+    return out
+
+
+def write_into(img: Image.Image, path: Path, index: int = None, shape: tuple = None) -> tuple:
+    """Write img in place into an existing .npy or raw uint8 array file.
+    
+    With index, img fills that slot of an (N, H, W[, C]) array; otherwise it
+    fills the whole array. Raw files need their full shape. Only the pages of
+    the target slot are touched. Returns the shape written.
+    """
+    import numpy as np
+    
+    if path.suffix.lower() == '.npy':
+        arr = np.load(path, mmap_mode='r+')
+    elif shape is None:
+        raise ValueError("Raw targets need --into-shape, e.g. N,H,W,C")
+    else:
+        arr = np.memmap(path, dtype=np.uint8, mode='r+', shape=shape)
+    
+    slot = arr
+    if index is not None:
+        if arr.ndim < 3 or not -len(arr) <= index < len(arr):
+            raise ValueError(f"Index {index} is out of range for target array of shape {arr.shape}")
+        slot = arr[index]
+    to_array(img, out=slot)
+    arr.flush()
+    return slot.shape
+
+
+def _alpha_bbox(img: Image.Image, threshold: int) -> tuple[int, int, int, int] | None:
+    """Find (left, top, right, bottom) of pixels with alpha above threshold in an RGBA image.
+    
+    Runs on the alpha band alone in Pillow (no copy of the colour bands, no numpy).
+    """
+    alpha = img.getchannel("A")
+    if threshold:
+        alpha = alpha.point(lambda value: 255 if value > threshold else 0)
+    return alpha.getbbox()
+
+
+# Modes resampled directly by the strip-parallel kernels ("LA"/"RGBA" go through
+# their premultiplied forms, exactly as Pillow does)
+_PARALLEL_MODES = ("L", "LA", "RGB", "RGBA", "RGBX", "CMYK", "I", "F")
+_PREMULTIPLIED = {"LA": "La", "RGBA": "RGBa"}
+
+# Smallest strip worth handing to a worker thread
+_MIN_STRIP = 64
+
+
+def _strips(length: int, workers: int) -> list[tuple[int, int]]:
+    """Split range(length) into up to workers contiguous (start, stop) strips."""
+    count = max(1, min(workers, length // _MIN_STRIP))
+    bounds = [length * i // count for i in range(count + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parallel_resize(img: Image.Image, size: tuple[int, int], resample=Image.Resampling.LANCZOS,
+                    workers: int = None) -> Image.Image:
+    """Resize on a thread pool, pixel-identical to img.resize(size, resample).
+    
+    Pillow resamples in two separable passes, horizontal then vertical, rounding
+    to the image's depth in between. The horizontal pass is split into row strips
+    and the vertical pass into column strips: each strip then uses exactly the
+    filter coefficients of the full-image call, so no overlap bookkeeping (or
+    floating-point drift from shifted boxes) is involved. Strips are pasted into a
+    preallocated image from the worker threads; Pillow releases the GIL throughout.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    workers = workers or os.cpu_count() or 1
+    width, height = img.size
+    out_width, out_height = size
+    # Pillow resamples very tall images vertically first; keep its single call there
+    tall = height > width * 100 and out_height < height
+    if workers < 2 or img.mode not in _PARALLEL_MODES or tall or size == img.size:
+        return img.resize(size, resample=resample)
+    
+    work = img.convert(_PREMULTIPLIED[img.mode]) if img.mode in _PREMULTIPLIED else img
+    work.load()
+    
+    def horizontal(rows):
+        top, bottom = rows
+        strip = work.crop((0, top, width, bottom)).resize((out_width, bottom - top), resample=resample)
+        stitched.paste(strip, (0, top))
+    
+    def vertical(cols):
+        left, right = cols
+        strip = work.crop((left, 0, right, height)).resize((right - left, out_height), resample=resample)
+        stitched.paste(strip, (left, 0))
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if out_width != width:
+            stitched = Image.new(work.mode, (out_width, height))
+            list(pool.map(horizontal, _strips(height, workers)))
+            work = stitched
+        if out_height != height:
+            stitched = Image.new(work.mode, (out_width, out_height))
+            list(pool.map(vertical, _strips(out_width, workers)))
+            work = stitched
+    
+    return work.convert(img.mode) if img.mode in _PREMULTIPLIED else work
+
+
+def parallel_rotate(img: Image.Image, angle: float, workers: int = None) -> Image.Image:
+    """Rotate by an arbitrary angle on a thread pool, pixel-identical to
+    img.rotate(angle, expand=True, resample=BICUBIC).
+    
+    Bicubic sampling treats each channel independently, so the channels are
+    rotated concurrently and merged. (Row strips are not exact here: Pillow's
+    core transform evaluates the inverse matrix in strip-local coordinates, and
+    re-basing the matrix per strip moves some samples by one ulp.) Single-channel
+    images use the single-threaded call.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    workers = workers or os.cpu_count() or 1
+    if workers < 2 or img.mode not in _PARALLEL_MODES or len(img.getbands()) < 2:
+        return img.rotate(angle, expand=True, resample=Image.Resampling.BICUBIC)
+    
+    work = img.convert(_PREMULTIPLIED[img.mode]) if img.mode in _PREMULTIPLIED else img
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        bands = list(pool.map(lambda band: band.rotate(angle, expand=True, resample=Image.Resampling.BICUBIC),
+                              work.split()))
+    
+    out = Image.merge(work.mode, bands)
+    out = out.convert(img.mode) if img.mode in _PREMULTIPLIED else out
+    out.info = img.info.copy()
+    return out
 
 
-def rotate_image(img: Image.Image, angle: float) -> Image.Image:
-    """Rotate image by specified angle (counterclockwise)."""
+def rotate_image(img: Image.Image, angle: float, workers: int = None) -> Image.Image:
+    """Rotate image by specified angle (counterclockwise).
+    
+    Arbitrary angles are resampled on `workers` threads when workers > 1.
+    """
     if angle % 90 == 0:
         turns = int(angle // 90) % 4
         if turns == 1:
@@ -30,6 +451,8 @@ def rotate_image(img: Image.Image, angle: float) -> Image.Image:
         elif turns == 3:
             return img.transpose(Image.Transpose.ROTATE_270)
         return img
+    if workers and workers > 1:
+        return parallel_rotate(img, angle, workers)
     return img.rotate(angle, expand=True, resample=Image.Resampling.BICUBIC)
 
 
@@ -43,8 +466,12 @@ def flip_image(img: Image.Image, direction: str) -> Image.Image:
         raise ValueError(f"Invalid flip direction: {direction}. Use 'horizontal' or 'vertical'")
 
 
-def resize_image(img: Image.Image, width: int = None, height: int = None) -> Image.Image:
-    """Resize image with flexible dimension handling."""
+def resize_image(img: Image.Image, width: int = None, height: int = None,
+                 workers: int = None) -> Image.Image:
+    """Resize image with flexible dimension handling.
+    
+    Resampling runs on `workers` threads when workers > 1.
+    """
     if width is None and height is None:
         return img
     
@@ -59,6 +486,8 @@ def resize_image(img: Image.Image, width: int = None, height: int = None) -> Ima
         ratio = height / orig_height
         new_size = (int(orig_width * ratio), height)
     
+    if workers and workers > 1:
+        return parallel_resize(img, new_size, workers=workers)
     return img.resize(new_size, resample=Image.Resampling.LANCZOS)
 
 
@@ -70,8 +499,9 @@ def handle_transparency(img: Image.Image, replacement_color: tuple = None) -> Im
     if replacement_color is None:
         replacement_color = (255, 255, 255)
     
+    # The RGBA image is its own paste mask (its alpha band), so nothing is split out
     background = Image.new("RGB", img.size, replacement_color)
-    background.paste(img, mask=img.split()[3])
+    background.paste(img, (0, 0), img)
     return background
 
 
@@ -109,17 +539,14 @@ def alpha_blend(img: Image.Image, mask: Image.Image) -> Image.Image:
     if mask.size != img.size:
         mask = mask.resize(img.size, resample=Image.Resampling.LANCZOS)
     
-    # Convert image to RGB if needed
-    if img.mode == "RGBA":
-        rgb_img = img.convert("RGB")
-    elif img.mode != "RGB":
-        rgb_img = img.convert("RGB")
-    else:
-        rgb_img = img
+    # RGB and RGBA share the colour bands as-is; other modes go through RGB
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
     
-    # Merge RGB channels with alpha mask
-    r, g, b = rgb_img.split()
-    return Image.merge("RGBA", (r, g, b, mask))
+    # Replace the alpha band in place rather than splitting and merging every band
+    blended = img.copy() if img.mode == "RGBA" else img.convert("RGBA")
+    blended.putalpha(mask)
+    return blended
 
 
 def autocrop_transparency(img: Image.Image, threshold_percent: float = 0) -> Image.Image:
@@ -140,31 +567,21 @@ def autocrop_transparency(img: Image.Image, threshold_percent: float = 0) -> Ima
     # Convert threshold from percentage to 0-255 range
     threshold = int((threshold_percent / 100) * 255)
     
-    # Get alpha channel as numpy array
-    alpha = np.array(img.split()[3])
-    
-    # Find rows and columns where alpha exceeds threshold
-    rows_with_content = np.any(alpha > threshold, axis=1)
-    cols_with_content = np.any(alpha > threshold, axis=0)
-    
-    if not np.any(rows_with_content) or not np.any(cols_with_content):
+    # Find bounding box of pixels whose alpha exceeds threshold
+    bbox = _alpha_bbox(img, threshold)
+    if bbox is None:
         # No content found above threshold, return original
         return img
     
-    # Find bounding box
-    top = np.argmax(rows_with_content)
-    bottom = len(rows_with_content) - np.argmax(rows_with_content[::-1])
-    left = np.argmax(cols_with_content)
-    right = len(cols_with_content) - np.argmax(cols_with_content[::-1])
-    
-    return img.crop((left, top, right, bottom))
+    return img.crop(bbox)
 
 
 def pad_image(img: Image.Image, top: int = 0, right: int = 0, bottom: int = 0, left: int = 0,
               color: tuple = None, edge: bool = False) -> Image.Image:
     """Pad image on specified sides."""
     if edge:
-        arr = np.array(img)
+        import numpy as np
+        arr = np.asarray(img)  # np.pad copies anyway, so a read-only view is enough
         if arr.ndim == 2:
             padded = np.pad(arr, ((top, bottom), (left, right)), mode='edge')
         else:
@@ -203,6 +620,7 @@ def crop_image(img: Image.Image, top: int = 0, right: int = 0, bottom: int = 0,
 
 def _get_encoded_size(img: Image.Image, fmt: str, quality: int = None) -> int:
     """Get encoded file size without writing to disk."""
+    _profiler.count("encode_probes")
     buffer = io.BytesIO()
     save_kwargs = {}
     if quality is not None:
@@ -233,8 +651,14 @@ def _find_optimal_quality(img: Image.Image, target_bytes: int, fmt: str) -> int
     return best_quality
 
 
-def reduce_file_size(img: Image.Image, target_mb: float, output_format: str) -> tuple[Image.Image, dict]:
-    """Reduce image file size to below target megabytes."""
+def reduce_file_size(img: Image.Image, target_mb: float, output_format: str,
+                     hint: dict = None) -> tuple[Image.Image, dict]:
+    """Reduce image file size to below target megabytes.
+    
+    Args:
+        hint: Previously found {"size": [w, h], "quality": q} for this input. It is
+              checked with a single encode and the search is skipped if it still fits.
+    """
     target_bytes = int(target_mb * 1024 * 1024)
     format_lower = output_format.lower()
     fmt = 'JPEG' if format_lower in ['jpeg', 'jpg'] else format_lower.upper()
@@ -243,6 +667,19 @@ def reduce_file_size(img: Image.Image, target_mb: float, output_format: str) ->
     if format_lower in ['jpeg', 'jpg'] and img.mode == 'RGBA':
         working_img = handle_transparency(img)
     
+    if hint is not None and format_lower in ['jpeg', 'jpg', 'webp', 'png']:
+        size, quality = tuple(hint['size']), hint.get('quality')
+        candidate = working_img
+        if size != working_img.size:
+            candidate = working_img.resize(size, resample=Image.Resampling.LANCZOS)
+        if _get_encoded_size(candidate, fmt, quality) <= target_bytes:
+            if format_lower == 'png':
+                return candidate, {'optimize': True}
+            save_kwargs = {'quality': quality}
+            if format_lower == 'webp':
+                save_kwargs['method'] = 6
+            return candidate, save_kwargs
+    
     if format_lower in ['jpeg', 'jpg', 'webp']:
         quality = _find_optimal_quality(working_img, target_bytes, fmt)
         if quality is not None:
@@ -298,9 +735,169 @@ def reduce_file_size(img: Image.Image, target_mb: float, output_format: str) ->
     raise ValueError(f"Cannot reduce file size to {target_mb}MB. Try a smaller target or different format.")
 
 
-def get_image_info(img: Image.Image, file_path: Path) -> dict:
-    """Get image metadata information."""
-    file_size = os.path.getsize(file_path)
+def prepare_for_save(img: Image.Image, output_format: str) -> tuple[Image.Image, dict]:
+    """Apply the default per-format conversion and encoder settings."""
+    save_kwargs = {}
+    if output_format == 'JPEG':
+        if img.mode == "RGBA":
+            img = handle_transparency(img)
+        elif img.mode == "L":
+            pass  # Grayscale is fine for JPEG
+        save_kwargs["quality"] = 95
+    elif output_format == 'PNG':
+        save_kwargs["optimize"] = True
+    elif output_format == 'WEBP':
+        save_kwargs["quality"] = 90
+    return img, save_kwargs
+
+
+def _save_variant(img: Image.Image, output_format: str, path: Path) -> dict:
+    """Encode one variant and describe it for the manifest."""
+    img, save_kwargs = prepare_for_save(img, output_format)
+    data = encode_image(img, output_format, **save_kwargs)
+    path.write_bytes(data)
+    return {
+        'path': str(path),
+        'width': img.size[0],
+        'height': img.size[1],
+        'format': output_format,
+        'bytes': len(data),
+    }
+
+
+def generate_variants(img: Image.Image, widths: list[int], formats: list[str], base_path: Path,
+                      workers: int = None) -> list[dict]:
+    """Write resized copies of img at each width in each format from a single decode.
+    
+    Widths are built largest first, each resampled from the smallest level already
+    built that is at least twice as wide (or from img), so small sizes don't pay for
+    resampling the full-resolution source. Widths larger than img are skipped.
+    Encodes run concurrently on a thread pool; Pillow releases the GIL while encoding.
+    
+    Args:
+        img: Source image (already decoded and processed)
+        widths: Target widths in pixels
+        formats: Pillow format names, e.g. ['JPEG', 'WEBP']
+        base_path: Outputs are named <stem>-<width>w<ext> next to base_path
+        workers: Encoder threads (default: ThreadPoolExecutor default)
+    
+    Returns:
+        Manifest entries (path, width, height, format, bytes), largest width first
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    extensions = {fmt: ext for ext, fmt in reversed(FORMAT_MAP.items())}
+    levels = [img]
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for width in sorted(set(widths), reverse=True):
+            if width > img.size[0]:
+                continue
+            if width == img.size[0]:
+                level = img
+            else:
+                source = min((lvl for lvl in levels if lvl.size[0] >= 2 * width),
+                             key=lambda lvl: lvl.size[0], default=img)
+                height = max(1, int(img.size[1] * width / img.size[0]))
+                level = source.resize((width, height), resample=Image.Resampling.LANCZOS)
+                levels.append(level)
+            for fmt in formats:
+                path = base_path.with_name(f"{base_path.stem}-{width}w{extensions[fmt]}")
+                futures.append(pool.submit(_save_variant, level, fmt, path))
+        return [future.result() for future in futures]
+
+
+def _file_digest(path: Path) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _operation_chain(args: argparse.Namespace) -> list:
+    """Normalize the pixel-affecting CLI options into a list, in application order."""
+    chain = [["raw_shape", list(parse_shape(args.raw_shape))]] if args.raw_shape else []
+    if args.extract_mask:
+        return chain + [["extract_mask"]]
+    
+    if args.rotate is not None:
+        chain.append(["rotate", args.rotate % 360])
+    if args.flip:
+        chain.append(["flip", args.flip])
+    if args.autocrop_transparency is not None:
+        chain.append(["autocrop", args.autocrop_transparency])
+    if args.crop:
+        chain.append(["crop", parse_padding_or_crop(args.crop)])
+    if args.width is not None or args.height is not None:
+        chain.append(["resize", args.width, args.height])
+    if args.pad:
+        pad_color = parse_color(args.pad_color) if args.pad_color else None
+        chain.append(["pad", parse_padding_or_crop(args.pad), pad_color, args.pad_edge])
+    if args.mask:
+        chain.append(["mask", _file_digest(Path(args.mask))])
+    if args.grayscale:
+        chain.append(["grayscale"])
+    if args.replace_transparency:
+        chain.append(["transparency", parse_color(args.replace_transparency)])
+    elif args.remove_transparency:
+        chain.append(["transparency", None])
+    return chain
+
+
+def _cache_key(*parts) -> str:
+    """Hash JSON-serializable key parts (input digest, operation chain, output settings)."""
+    payload = json.dumps([CACHE_VERSION, *parts], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cache_get(cache_dir: Path, key: str) -> bytes | None:
+    """Return cached bytes for key, marking the entry as recently used."""
+    path = cache_dir / key
+    try:
+        data = path.read_bytes()
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return data
+
+
+def _cache_put(cache_dir: Path, key: str, data: bytes, max_bytes: int):
+    """Store bytes under key, then evict least recently used entries above max_bytes."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_dir / f".{key}.{os.getpid()}.tmp"
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, cache_dir / key)
+    
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and not entry.name.startswith('.'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        total -= size
+
+
+def _format_size(num_bytes: int) -> str:
+    """Human-readable file size."""
+    if num_bytes >= 1024 * 1024:
+        return f"{num_bytes / (1024 * 1024):.2f} MB"
+    elif num_bytes >= 1024:
+        return f"{num_bytes / 1024:.2f} KB"
+    return f"{num_bytes} bytes"
+
+
+def get_image_info(img: Image.Image, file_path: Path, file_size: int = None) -> dict:
+    """Get image metadata information (file_size defaults to the size on disk)."""
+    if file_size is None:
+        file_size = os.path.getsize(file_path)
     
     if file_size >= 1024 * 1024:
         size_str = f"{file_size / (1024 * 1024):.2f} MB"
@@ -357,7 +954,327 @@ def parse_padding_or_crop(value: str) -> tuple[int, int, int, int]:
         raise ValueError("Use 1, 2, or 4 comma-separated values")
 
 
-def main():
+def _quiet(message: str):
+    """Log function that discards messages (used for all but the first frame)."""
+
+
+def orient_image(img: Image.Image, args: argparse.Namespace, log=print) -> Image.Image:
+    """Apply the --rotate and --flip steps of the operation chain."""
+    if args.rotate is not None:
+        with _profiler.step("rotate"):
+            img = rotate_image(img, args.rotate, args.threads)
+        log(f"Rotated {args.rotate}°")
+    
+    if args.flip:
+        with _profiler.step("flip"):
+            img = flip_image(img, args.flip)
+        log(f"Flipped {args.flip}")
+    
+    return img
+
+
+def apply_operations(img: Image.Image, args: argparse.Namespace, log=print,
+                     mask_img: Image.Image = None, autocrop_box: tuple = None) -> Image.Image:
+    """Apply the operation chain after orientation: autocrop → crop → resize → pad → mask → grayscale → transparency.
+    
+    Args:
+        mask_img: Preloaded --mask image (opened from args.mask if None)
+        autocrop_box: Precomputed autocrop bounding box (computed from img if None)
+    
+    Raises:
+        ValueError: Invalid crop, padding or color options, or the mask cannot be applied
+        FileNotFoundError: The --mask file does not exist
+    """
+    # Auto-crop transparency (before manual crop)
+    if args.autocrop_transparency is not None:
+        if img.mode != "RGBA":
+            log(f"Note: Image has no transparency (mode: {img.mode}), skipping autocrop")
+        else:
+            old_size = img.size
+            with _profiler.step("autocrop"):
+                if autocrop_box is not None:
+                    img = img.crop(autocrop_box)
+                else:
+                    img = autocrop_transparency(img, args.autocrop_transparency)
+            log(f"Auto-cropped transparency from {old_size} to {img.size} (threshold: {args.autocrop_transparency}%)")
+    
+    if args.crop:
+        try:
+            top, right, bottom, left = parse_padding_or_crop(args.crop)
+            old_size = img.size
+            with _profiler.step("crop"):
+                img = crop_image(img, top, right, bottom, left)
+            log(f"Cropped from {old_size} to {img.size}")
+        except ValueError as e:
+            raise ValueError(f"Invalid crop value: {e}") from e
+    
+    if args.width is not None or args.height is not None:
+        old_size = img.size
+        with _profiler.step("resize"):
+            img = resize_image(img, args.width, args.height, args.threads)
+        log(f"Resized from {old_size} to {img.size}")
+    
+    if args.pad:
+        try:
+            top, right, bottom, left = parse_padding_or_crop(args.pad)
+            pad_color = None
+            if args.pad_color:
+                pad_color = parse_color(args.pad_color)
+            old_size = img.size
+            with _profiler.step("pad"):
+                img = pad_image(img, top, right, bottom, left, color=pad_color, edge=args.pad_edge)
+            log(f"Padded from {old_size} to {img.size}")
+        except ValueError as e:
+            raise ValueError(f"Invalid padding: {e}") from e
+    
+    # Alpha blend with mask
+    if args.mask is not None:
+        if mask_img is None and not Path(args.mask).exists():
+            raise FileNotFoundError(f"Mask file not found: {args.mask}")
+        try:
+            with _profiler.step("mask"):
+                if mask_img is None:
+                    mask_img = _open_image(Path(args.mask))
+                img = alpha_blend(img, mask_img)
+        except Exception as e:
+            raise ValueError(f"Could not apply mask: {e}") from e
+        log(f"Applied alpha mask from {args.mask}")
+    
+    # Grayscale conversion
+    if args.grayscale:
+        with _profiler.step("grayscale"):
+            img = convert_to_grayscale(img)
+        log("Converted to grayscale")
+    
+    if args.replace_transparency or args.remove_transparency:
+        if img.mode != "RGBA":
+            log(f"Note: Image has no transparency (mode: {img.mode})")
+        else:
+            if args.replace_transparency:
+                color = parse_color(args.replace_transparency)
+                with _profiler.step("transparency"):
+                    img = handle_transparency(img, color)
+                log(f"Replaced transparency with {color}")
+            else:
+                with _profiler.step("transparency"):
+                    img = handle_transparency(img)
+                log("Removed transparency (converted to RGB with white background)")
+    
+    return img
+
+
+def read_frames(img: Image.Image) -> tuple[list[Image.Image], list[int]]:
+    """Decode every frame of an animated image, with its duration in milliseconds.
+    
+    Pillow composites each frame onto the canvas using the source's disposal and
+    blend info, so the returned frames are full canvases in a shared mode (RGBA if
+    any frame has transparency, RGB otherwise).
+    """
+    from PIL import ImageSequence
+    
+    frames, durations = [], []
+    transparent = False
+    for frame in ImageSequence.Iterator(img):
+        frames.append(frame.copy())
+        # Read after copy(): some plugins (WebP) only fill in duration on load
+        durations.append(frame.info.get("duration", 100))
+        transparent = transparent or frame.has_transparency_data
+    
+    mode = "RGBA" if transparent else "RGB"
+    return [frame.convert(mode) for frame in frames], durations
+
+
+def process_frames(frames: list[Image.Image], args: argparse.Namespace,
+                   workers: int = None) -> list[Image.Image]:
+    """Apply the operation chain to every frame of an animation on a thread pool.
+    
+    Frames share one canvas size, so every geometric step resolves identically for
+    all of them. The content-dependent parts of the plan (the autocrop box, the
+    mask) are computed once and reused. The first frame runs in the calling thread
+    so each step is reported once and invalid options fail before fan-out.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        first = orient_image(frames[0], args)
+        oriented = [first, *pool.map(lambda frame: orient_image(frame, args, _quiet), frames[1:])]
+        
+        # Union of every frame's content box, so cropping never clips a later frame
+        autocrop_box = None
+        if args.autocrop_transparency is not None and first.mode == "RGBA":
+            threshold = int((args.autocrop_transparency / 100) * 255)
+            boxes = [box for box in pool.map(lambda frame: _alpha_bbox(frame, threshold), oriented) if box is not None]
+            autocrop_box = (0, 0, *first.size)
+            if boxes:
+                autocrop_box = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                                max(b[2] for b in boxes), max(b[3] for b in boxes))
+        
+        mask_img = None
+        if args.mask and Path(args.mask).exists():
+            with contextlib.suppress(Exception):
+                mask_img = _open_image(Path(args.mask))  # Errors are reported by the first frame
+        
+        first = apply_operations(first, args, mask_img=mask_img, autocrop_box=autocrop_box)
+        rest = pool.map(lambda frame: apply_operations(frame, args, _quiet, mask_img, autocrop_box), oriented[1:])
+        return [first, *rest]
+
+
+def _animation_save_kwargs(frames: list[Image.Image], durations: list[int], loop: int | None,
+                           output_format: str) -> dict:
+    """Encoder arguments for writing frames as an animation.
+    
+    loop is the source's loop count, or None for a play-once animation (a GIF
+    without a loop extension).
+    """
+    save_kwargs = {'save_all': True, 'append_images': frames[1:], 'duration': durations}
+    if loop is not None:
+        save_kwargs['loop'] = loop
+    elif output_format != 'GIF':
+        save_kwargs['loop'] = 1  # WebP and APNG count plays and default to looping forever
+    if frames[0].mode == "RGBA":
+        # Frames are full canvases: clear to background between frames so
+        # transparent areas don't show the previous frame through
+        if output_format == 'GIF':
+            save_kwargs['disposal'] = 2
+        elif output_format == 'PNG':
+            save_kwargs['disposal'] = 1  # APNG_DISPOSE_OP_BACKGROUND
+    return save_kwargs
+
+
+def _output_format(args: argparse.Namespace) -> str:
+    """Pillow format for the output: --format if given, else the output extension (PNG if unknown)."""
+    ext = args.format or Path(args.output).suffix
+    return FORMAT_MAP.get("." + ext.lower().lstrip("."), 'PNG')
+
+
+def encode_image(img: Image.Image, output_format: str, **save_kwargs) -> bytes:
+    """Encode an image into an in-memory buffer (array formats hold the pixels as-is)."""
+    buffer = io.BytesIO()
+    if output_format in ARRAY_FORMATS:
+        import numpy as np
+        arr = to_array(img)
+        if output_format == 'NPY':
+            np.save(buffer, arr)
+        else:
+            buffer.write(arr.tobytes())
+    else:
+        img.save(buffer, format=output_format, **save_kwargs)
+    return buffer.getvalue()
+
+
+def _options_namespace(options: dict) -> argparse.Namespace:
+    """CLI defaults overridden by keyword options named after the CLI flags."""
+    args = build_parser().parse_args([])
+    for key, value in options.items():
+        if not hasattr(args, key):
+            raise ValueError(f"Unknown option: {key}")
+        if key in ("crop", "pad") and isinstance(value, (int, tuple, list)):
+            value = ",".join(str(v) for v in (value if isinstance(value, (tuple, list)) else [value]))
+        setattr(args, key, value)
+    return args
+
+
+def edit_image(source: Image.Image | bytes | np.ndarray, **options) -> Image.Image:
+    """Run the operation chain in memory and return the resulting image.
+    
+    Args:
+        source: A PIL image, encoded image bytes (or .npy bytes), or a uint8
+                (H, W[, C]) array such as one slot of a memmapped dataset
+        **options: CLI flag names with CLI values, e.g. rotate=90, width=800,
+                   pad="10,20" (or (10, 20)), pad_color="red", grayscale=True.
+                   mask may be a path or a PIL image.
+    
+    Raises:
+        ValueError: Invalid options, or an operation cannot be applied
+    """
+    if isinstance(source, Image.Image):
+        img = source
+    elif hasattr(source, "__array_interface__"):
+        img = load_array(source)
+    else:
+        img = _open_image(bytes(source))
+    mask_img = options.get("mask") if isinstance(options.get("mask"), Image.Image) else None
+    if mask_img is not None:
+        options = {**options, "mask": "<image>"}
+    args = _options_namespace(options)
+    return apply_operations(orient_image(img, args, _quiet), args, _quiet, mask_img=mask_img)
+
+
+def edit(source: Image.Image | bytes, output_format: str = "PNG", **options) -> bytes:
+    """Run the operation chain in memory and return the encoded output.
+    
+    Takes the same options as edit_image, plus max_size (MB) to search for the
+    largest output under that size. output_format is a Pillow format name or a
+    file extension ("JPEG", "jpg", ".webp", ...). Nothing touches the disk.
+    
+    Example:
+        data = edit(Path("in.png").read_bytes(), "webp", width=800, max_size=0.5)
+    """
+    max_size = options.pop("max_size", None)
+    output_format = FORMAT_MAP.get("." + output_format.lower().lstrip("."), output_format.upper())
+    if output_format == 'HEIF':
+        _register_heif()
+    
+    img = edit_image(source, **options)
+    if max_size:
+        img, save_kwargs = reduce_file_size(img, max_size, output_format)
+    else:
+        img, save_kwargs = prepare_for_save(img, output_format)
+    return encode_image(img, output_format, **save_kwargs)
+
+
+def edit_into(source: Image.Image | bytes | np.ndarray, out: np.ndarray, **options) -> np.ndarray:
+    """Run the operation chain in memory and write the pixels into out.
+    
+    out is a writable uint8 array, e.g. one slot of a memmapped dataset; the
+    result goes there without any encode/decode. Takes the same options as edit_image.
+    
+    Example:
+        dataset = np.load("train.npy", mmap_mode="r+")  # (N, 224, 224, 3)
+        edit_into(Path("in.png").read_bytes(), dataset[7], width=224, height=224)
+    """
+    return to_array(edit_image(source, **options), out)
+
+
+def optional_dependencies(output_format: str = "PNG", **options) -> list[str]:
+    """Lazily imported modules (numpy, pillow_heif) that edit() needs for these options.
+    
+    Takes the same arguments as edit(). Rotate, flip, resize, crop, colour padding,
+    masks, transparency handling, grayscale and every encoded format except HEIF
+    run on Pillow alone.
+    """
+    output_format = FORMAT_MAP.get("." + output_format.lower().lstrip("."), output_format.upper())
+    mask = options.get("mask")
+    mask_suffix = Path(mask).suffix.lower() if isinstance(mask, (str, Path)) else ""
+    modules = []
+    if ((options.get("pad") and options.get("pad_edge")) or options.get("raw_shape")
+            or output_format in ARRAY_FORMATS or mask_suffix in ARRAY_SUFFIXES):
+        modules.append("numpy")
+    if output_format == 'HEIF' or mask_suffix in HEIF_SUFFIXES:
+        modules.append("pillow_heif")
+    return modules
+
+
+def validate_options(**options):
+    """Check options for edit/edit_image/edit_into without decoding any image.
+    
+    Parses the crop, pad, color and shape values and checks that a mask path
+    can be read, so callers can reject bad options before producing the input.
+    
+    Raises:
+        ValueError: Unknown or invalid options
+    """
+    if isinstance(options.get("mask"), Image.Image):
+        options = {**options, "mask": None}
+    args = _options_namespace(options)
+    try:
+        _operation_chain(args)
+    except OSError as e:
+        raise ValueError(str(e))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser (shared by the CLI and worker daemon)."""
     parser = argparse.ArgumentParser(
         description="Image editing: rotate, flip, resize, transparency, pad, crop, convert, grayscale, mask, blend",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -375,11 +1292,29 @@ Examples:
   Extract mask:        %(prog)s input.png -o mask.png --extract-mask
   Alpha blend:         %(prog)s input.png -o output.png --mask mask.png
   Auto-crop alpha:     %(prog)s input.png -o output.png --autocrop-transparency 5
+  To NumPy:            %(prog)s input.png -o output.npy --width 224
+  Into dataset slot:   %(prog)s input.png --into train.npy --index 7 --width 224 --height 224
+  Stream:              cat input.png | %(prog)s - -o - --format webp --width 800 > output.webp
+  Start worker:        %(prog)s --serve /tmp/image_edit.sock --workers 4
+  Use worker:          %(prog)s input.png -o output.png --width 800 --socket /tmp/image_edit.sock
         """
     )
     
-    parser.add_argument("input", help="Input image path")
-    parser.add_argument("-o", "--output", help="Output image path (required except for --info)")
+    parser.add_argument("input", nargs="?", help="Input image path ('-' reads stdin)")
+    parser.add_argument("-o", "--output", help="Output image path ('-' writes stdout; required except for --info)")
+    parser.add_argument("--format", metavar="EXT",
+                       help="Output format, e.g. jpg or webp (default: output extension, PNG for stdout)")
+    
+    # Array input/output
+    parser.add_argument("--raw-shape", metavar="H,W[,C]",
+                       help="Read the input as a raw C-order uint8 array of this shape (.npy needs no shape)")
+    parser.add_argument("--into", metavar="ARRAY",
+                       help="Write the result in place into an existing .npy or raw uint8 array file "
+                            "instead of --output (no encoding)")
+    parser.add_argument("--index", type=int, metavar="N",
+                       help="Slot of an (N, H, W[, C]) --into array to write (default: the whole array)")
+    parser.add_argument("--into-shape", metavar="SHAPE",
+                       help="Full shape of a raw --into array, e.g. 1000,224,224,3")
     
     # Info mode
     parser.add_argument("--info", action="store_true",
@@ -435,28 +1370,168 @@ Examples:
     parser.add_argument("--autocrop-transparency", type=float, metavar="THRESHOLD",
                        help="Auto-crop transparent borders (threshold 0-100%%)")
     
-    args = parser.parse_args()
+    # Profiling
+    parser.add_argument("--profile", action="store_true",
+                       help="Print wall/CPU time per step, encode probes and peak RSS")
+    parser.add_argument("--profile-json", metavar="FILE",
+                       help="Write the --profile report as JSON to FILE")
+    
+    # Parallel execution
+    parser.add_argument("--threads", type=int, metavar="N",
+                       help="Run resize (row/column strips) and arbitrary-angle rotate (per channel) on N threads "
+                            "(same pixels as single-threaded; 0 = CPU count)")
+    
+    # Responsive variants
+    parser.add_argument("--variants", metavar="WIDTHS",
+                       help="Write one output per comma-separated width from a single decode, "
+                            "named <stem>-<width>w.<ext>, plus a <stem>.variants.json manifest")
+    parser.add_argument("--variant-formats", metavar="EXTS",
+                       help="Comma-separated output extensions for --variants, e.g. jpg,webp "
+                            "(default: output extension)")
+    
+    # Result cache
+    parser.add_argument("--cache-dir", metavar="DIR",
+                       help="Cache encoded results in DIR (default: $IMAGE_EDIT_CACHE_DIR, off if unset)")
+    parser.add_argument("--cache-size", type=float, default=512, metavar="MB",
+                       help="Maximum cache size before least recently used entries are evicted (default: 512)")
+    
+    # Worker daemon
+    parser.add_argument("--serve", metavar="SOCKET",
+                       help="Run as a worker daemon listening on Unix socket SOCKET")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                       help="Number of warm worker processes for --serve (default: CPU count)")
+    parser.add_argument("--socket", metavar="SOCKET",
+                       help="Send the job to a worker daemon (default: $IMAGE_EDIT_SOCKET); "
+                            "runs locally if no daemon is listening")
+    
+    return parser
+
+
+def main(argv: list[str] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    if args.serve:
+        serve(args.serve, args.workers)
+        return
     
     # Validate arguments
-    if not args.info and not args.output:
-        parser.error("--output is required unless using --info")
+    if not args.input:
+        parser.error("input is required unless using --serve")
+    if not args.info and not args.output and not args.into:
+        parser.error("--output is required unless using --info or --into")
+    if args.into and (args.output or args.max_size or args.variants):
+        parser.error("--into cannot be combined with --output, --max-size or --variants")
+    if (args.index is not None or args.into_shape) and not args.into:
+        parser.error("--index and --into-shape require --into")
+    if args.threads == 0:
+        args.threads = os.cpu_count() or 1
+    if args.variants and (args.max_size or args.extract_mask):
+        parser.error("--variants cannot be combined with --max-size or --extract-mask")
+    if args.variants and args.output == STDIO:
+        parser.error("--variants writes several files and cannot write to stdout")
+    if args.max_size and args.output and _output_format(args) in ARRAY_FORMATS:
+        parser.error("--max-size does not apply to .npy/.raw outputs")
+    
+    # --socket hand-off happens before this, in the thin client under __main__
+    process_image(args)
+
+
+def process_image(args: argparse.Namespace):
+    """Run the operation chain described by parsed CLI arguments, reporting --profile data."""
+    global _profiler
+    _profiler = Profiler(enabled=bool(args.profile or args.profile_json))
+    # With encoded output on stdout, progress messages go to stderr
+    stdout = sys.stdout.buffer if args.output == STDIO else None
+    try:
+        with contextlib.redirect_stdout(sys.stderr) if stdout else contextlib.nullcontext():
+            with _profiler.step("total"):
+                _process_image(args, stdout)
+    finally:
+        if args.profile:
+            with contextlib.redirect_stdout(sys.stderr) if stdout else contextlib.nullcontext():
+                _profiler.print_table()
+        if args.profile_json:
+            Path(args.profile_json).write_text(json.dumps(_profiler.report(), indent=2))
+
+
+def _write_output(output: str, data: bytes, stdout=None):
+    """Write encoded bytes to the output path, or to stdout for '-'."""
+    if output == STDIO:
+        stdout.write(data)
+        stdout.flush()
+    else:
+        Path(output).write_bytes(data)
+
+
+def _write_into(img: Image.Image, args: argparse.Namespace, into_shape: tuple = None):
+    """Write the result into the --into array, exiting on a shape or dtype mismatch."""
+    try:
+        with _profiler.step("write_into"):
+            shape = write_into(img, Path(args.into), args.index, into_shape)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    slot = f"[{args.index}]" if args.index is not None else ""
+    print(f"Written into: {args.into}{slot} (uint8, shape {shape})")
+
+
+def _process_image(args: argparse.Namespace, stdout=None):
+    if args.input == STDIO:
+        source = sys.stdin.buffer.read()
+        input_path = Path("<stdin>")
+    else:
+        input_path = Path(args.input)
+        if not input_path.exists():
+            print(f"Error: Input file not found: {args.input}")
+            sys.exit(1)
+        source = input_path
     
-    input_path = Path(args.input)
-    if not input_path.exists():
-        print(f"Error: Input file not found: {args.input}")
+    try:
+        raw_shape = parse_shape(args.raw_shape) if args.raw_shape else None
+        into_shape = parse_shape(args.into_shape) if args.into_shape else None
+    except ValueError as e:
+        print(f"Error: {e}")
         sys.exit(1)
     
+    output_format = None if args.info or args.into else _output_format(args)
+    output_name = "<stdout>" if args.output == STDIO else args.output
+    
+    # Result cache: a hit copies the stored encoded output without decoding anything
+    cache_dir = args.cache_dir or os.environ.get("IMAGE_EDIT_CACHE_DIR")
+    cache_key = search_key = None
+    if cache_dir and not args.info and not args.variants and not args.into:
+        cache_dir = Path(cache_dir)
+        _profiler.count("cache_lookups")
+        try:
+            chain = _operation_chain(args)
+        except (ValueError, OSError):
+            chain = None  # Invalid options are reported by the normal path below
+        if chain is not None:
+            digest = hashlib.sha256(source).hexdigest() if isinstance(source, bytes) else _file_digest(source)
+            cache_key = _cache_key(digest, chain, output_format, args.max_size)
+            cached = _cache_get(cache_dir, cache_key)
+            if cached is not None:
+                _profiler.count("cache_hits")
+                _write_output(args.output, cached, stdout)
+                print(f"Cache hit: {cache_key[:12]}")
+                print(f"Saved: {output_name} ({_format_size(len(cached))})")
+                return
+            if args.max_size:
+                search_key = _cache_key(digest, chain, output_format, ["search", args.max_size])
+    cache_max_bytes = int(args.cache_size * 1024 * 1024)
+    
     # Load image
     try:
-        img = Image.open(input_path)
-        img.load()
+        with _profiler.step("decode"):
+            img = _open_image(source, raw_shape)
     except Exception as e:
         print(f"Error loading image: {e}")
         sys.exit(1)
     
     # Info mode
     if args.info:
-        info = get_image_info(img, input_path)
+        info = get_image_info(img, input_path, len(source) if isinstance(source, bytes) else None)
         print(f"File:       {input_path.name}")
         print(f"Dimensions: {info['dimensions']}")
         print(f"Format:     {info['format']}")
@@ -465,7 +1540,8 @@ Examples:
         print(f"DPI:        {info['dpi']}")
         return
     
-    output_path = Path(args.output)
+    if output_format == 'HEIF':
+        _register_heif()
     
     # Extract mask mode (special handling - outputs mask only)
     if args.extract_mask:
@@ -473,147 +1549,243 @@ Examples:
         if mask is None:
             print(f"Error: Image has no transparency (mode: {img.mode})")
             sys.exit(1)
-        mask.save(output_path)
-        final_size = os.path.getsize(output_path)
-        size_str = f"{final_size / 1024:.2f} KB" if final_size >= 1024 else f"{final_size} bytes"
-        print(f"Extracted alpha mask: {output_path} ({size_str})")
+        if args.into:
+            _write_into(mask, args, into_shape)
+            return
+        data = encode_image(mask, output_format)
+        _write_output(args.output, data, stdout)
+        print(f"Extracted alpha mask: {output_name} ({_format_size(len(data))})")
+        if cache_key:
+            _cache_put(cache_dir, cache_key, data, cache_max_bytes)
         return
     
-    # Apply operations in order
-    
-    if args.rotate is not None:
-        img = rotate_image(img, args.rotate)
-        print(f"Rotated {args.rotate}°")
-    
-    if args.flip:
-        img = flip_image(img, args.flip)
-        print(f"Flipped {args.flip}")
-    
-    # Auto-crop transparency (before manual crop)
-    if args.autocrop_transparency is not None:
-        if img.mode != "RGBA":
-            print(f"Note: Image has no transparency (mode: {img.mode}), skipping autocrop")
+    # Animations keep every frame when the output format can hold them
+    frames = durations = loop = None
+    if getattr(img, "is_animated", False):
+        if output_format in ANIMATED_FORMATS and not (args.max_size or args.variants):
+            loop = img.info.get("loop")
+            with _profiler.step("read_frames"):
+                frames, durations = read_frames(img)
+            print(f"Animated input: {len(frames)} frames")
         else:
-            old_size = img.size
-            img = autocrop_transparency(img, args.autocrop_transparency)
-            print(f"Auto-cropped transparency from {old_size} to {img.size} (threshold: {args.autocrop_transparency}%)")
+            print("Note: Animated input; only the first frame is used")
     
-    if args.crop:
-        try:
-            top, right, bottom, left = parse_padding_or_crop(args.crop)
-            old_size = img.size
-            img = crop_image(img, top, right, bottom, left)
-            print(f"Cropped from {old_size} to {img.size}")
-        except ValueError as e:
-            print(f"Error: Invalid crop value: {e}")
-            sys.exit(1)
+    # Apply operations in order
+    try:
+        if frames:
+            with _profiler.step("process_frames"):
+                frames = process_frames(frames, args)
+            img = frames[0]
+        else:
+            img = apply_operations(orient_image(img, args), args)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     
-    if args.width is not None or args.height is not None:
-        old_size = img.size
-        img = resize_image(img, args.width, args.height)
-        print(f"Resized from {old_size} to {img.size}")
+    # Array targets take the pixels in place; nothing is encoded
+    if args.into:
+        _write_into(img, args, into_shape)
+        return
     
-    if args.pad:
+    # Responsive variants replace the single output
+    output_path = Path(args.output)
+    if args.variants:
         try:
-            top, right, bottom, left = parse_padding_or_crop(args.pad)
-            pad_color = None
-            if args.pad_color:
-                pad_color = parse_color(args.pad_color)
-            old_size = img.size
-            img = pad_image(img, top, right, bottom, left, color=pad_color, edge=args.pad_edge)
-            print(f"Padded from {old_size} to {img.size}")
+            widths = [int(w) for w in args.variants.split(",")]
+            extensions = args.variant_formats.split(",") if args.variant_formats else [args.format or output_path.suffix]
+            formats = [FORMAT_MAP.get("." + ext.strip().lstrip(".").lower(), 'PNG') for ext in extensions]
         except ValueError as e:
-            print(f"Error: Invalid padding: {e}")
-            sys.exit(1)
-    
-    # Alpha blend with mask
-    if args.mask:
-        mask_path = Path(args.mask)
-        if not mask_path.exists():
-            print(f"Error: Mask file not found: {args.mask}")
+            print(f"Error: Invalid variants: {e}")
             sys.exit(1)
+        if 'HEIF' in formats:
+            _register_heif()
         try:
-            mask_img = Image.open(mask_path)
-            img = alpha_blend(img, mask_img)
-            print(f"Applied alpha mask from {args.mask}")
+            with _profiler.step("variants"):
+                entries = generate_variants(img, widths, formats, output_path)
         except Exception as e:
-            print(f"Error applying mask: {e}")
+            print(f"Error saving variants: {e}")
             sys.exit(1)
-    
-    # Grayscale conversion
-    if args.grayscale:
-        img = convert_to_grayscale(img)
-        print("Converted to grayscale")
-    
-    if args.replace_transparency or args.remove_transparency:
-        if img.mode != "RGBA":
-            print(f"Note: Image has no transparency (mode: {img.mode})")
-        else:
-            if args.replace_transparency:
-                try:
-                    color = parse_color(args.replace_transparency)
-                except ValueError as e:
-                    print(f"Error: {e}")
-                    sys.exit(1)
-                img = handle_transparency(img, color)
-                print(f"Replaced transparency with {color}")
-            else:
-                img = handle_transparency(img)
-                print("Removed transparency (converted to RGB with white background)")
+        
+        skipped = sorted(w for w in set(widths) if w > img.size[0])
+        if skipped:
+            print(f"Note: Skipped widths larger than the image ({img.size[0]}px): {skipped}")
+        for entry in entries:
+            print(f"Saved: {entry['path']} ({_format_size(entry['bytes'])})")
+        
+        srcsets = {}
+        for entry in entries:
+            srcsets.setdefault(entry['format'], []).append(f"{Path(entry['path']).name} {entry['width']}w")
+        manifest_path = output_path.with_name(f"{output_path.stem}.variants.json")
+        manifest = {
+            'variants': entries,
+            'srcset': {fmt: ", ".join(reversed(items)) for fmt, items in srcsets.items()},
+        }
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+        print(f"Manifest: {manifest_path}")
+        return
     
     # Save output
     try:
         save_kwargs = {}
-        suffix = output_path.suffix.lower()
-        
-        format_map = {
-            '.jpg': 'JPEG',
-            '.jpeg': 'JPEG',
-            '.png': 'PNG',
-            '.webp': 'WEBP',
-            '.tiff': 'TIFF',
-            '.tif': 'TIFF',
-            '.heic': 'HEIF',
-            '.heif': 'HEIF',
-        }
-        
-        output_format = format_map.get(suffix, 'PNG')
         
         if args.max_size:
             try:
-                img, save_kwargs = reduce_file_size(img, args.max_size, output_format)
+                hint = None
+                if search_key:
+                    cached = _cache_get(cache_dir, search_key)
+                    hint = json.loads(cached) if cached else None
+                with _profiler.step("max_size_search"):
+                    img, save_kwargs = reduce_file_size(img, args.max_size, output_format, hint)
+                if search_key:
+                    # Remember the winning (size, quality) pair; it outlives evicted outputs cheaply
+                    winner = {"size": list(img.size), "quality": save_kwargs.get("quality")}
+                    _cache_put(cache_dir, search_key, json.dumps(winner).encode(), cache_max_bytes)
                 print(f"Optimized for max size {args.max_size}MB")
             except ValueError as e:
                 print(f"Error: {e}")
                 sys.exit(1)
         else:
-            if suffix in [".jpg", ".jpeg"]:
-                if img.mode == "RGBA":
-                    img = handle_transparency(img)
-                elif img.mode == "L":
-                    pass  # Grayscale is fine for JPEG
-                save_kwargs["quality"] = 95
-            elif suffix == ".png":
-                save_kwargs["optimize"] = True
-            elif suffix == ".webp":
-                save_kwargs["quality"] = 90
+            with _profiler.step("prepare"):
+                img, save_kwargs = prepare_for_save(img, output_format)
         
-        img.save(output_path, format=output_format, **save_kwargs)
+        if frames:
+            save_kwargs.update(_animation_save_kwargs(frames, durations, loop, output_format))
         
-        final_size = os.path.getsize(output_path)
-        if final_size >= 1024 * 1024:
-            size_str = f"{final_size / (1024 * 1024):.2f} MB"
-        elif final_size >= 1024:
-            size_str = f"{final_size / 1024:.2f} KB"
-        else:
-            size_str = f"{final_size} bytes"
+        with _profiler.step("encode_save"):
+            data = encode_image(img, output_format, **save_kwargs)
+            _write_output(args.output, data, stdout)
         
-        print(f"Saved: {output_path} ({size_str})")
+        print(f"Saved: {output_name} ({_format_size(len(data))})")
+        if output_format == 'RAW':
+            channels = len(data) // (img.size[0] * img.size[1])
+            print(f"Raw layout: uint8, H x W x C = {img.size[1]} x {img.size[0]} x {channels}")
+        
+        if cache_key:
+            _cache_put(cache_dir, cache_key, data, cache_max_bytes)
         
     except Exception as e:
         print(f"Error saving image: {e}")
         sys.exit(1)
 
 
+def _job_argv(job: dict) -> list[str]:
+    """Convert a JSON job into CLI arguments.
+
+    Jobs either carry a raw "argv" list or use CLI flag names as keys, e.g.
+    {"input": "in.png", "output": "out.png", "rotate": 90, "grayscale": true}.
+    
+    Raises:
+        ValueError: The job uses a daemon option (see DAEMON_OPTIONS)
+    """
+    if "argv" in job:
+        argv = [str(a) for a in job["argv"]]
+    else:
+        argv = [str(job["input"])]
+        for key, value in job.items():
+            if key in ("input", "cwd") or value is None or value is False:
+                continue
+            flag = "--" + key.replace("_", "-")
+            if value is True:
+                argv.append(flag)
+            else:
+                argv.extend([flag, str(value)])
+    
+    # Unique prefixes count too, as argparse would accept them ("--ser")
+    for arg in argv:
+        name = arg.partition("=")[0]
+        if name.startswith("--") and len(name) > 2 and any(option.startswith(name) for option in DAEMON_OPTIONS):
+            raise ValueError(f"{arg} is not allowed in a worker job")
+    return argv
+
+
+def _warm_worker():
+    """Preload the lazily imported dependencies once per daemon worker."""
+    import importlib
+    importlib.import_module("numpy")
+    _register_heif()
+
+
+def _run_job(argv: list[str], cwd: str) -> tuple[int, str]:
+    """Run one job inside a worker process, capturing its console output."""
+    buffer = io.StringIO()
+    returncode = 0
+    with contextlib.redirect_stdout(buffer), contextlib.redirect_stderr(buffer):
+        try:
+            os.chdir(cwd)
+            main(argv)
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            print(f"Error: {e}")
+            returncode = 1
+    return returncode, buffer.getvalue()
+
+
+def serve(socket_path: str, workers: int):
+    """Serve JSON jobs on a Unix socket using a pool of warm worker processes.
+
+    Protocol: one JSON job per connection, terminated by a newline. The reply is
+    a single JSON line {"returncode": int, "output": str}, sent for every job. If a
+    worker process dies, the pool is replaced and the job retried once.
+    """
+    import signal
+    import socketserver
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    
+    def start_pool() -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker)
+        # Start every worker up front so the first jobs don't pay for process startup
+        for future in [pool.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+        return pool
+    
+    pools = [start_pool()]
+    pool_lock = threading.Lock()
+    
+    def run(argv: list[str], cwd: str) -> tuple[int, str]:
+        """Run a job on the pool, replacing the pool (and retrying once) if a worker died."""
+        for attempt in range(2):
+            pool = pools[0]
+            try:
+                return pool.submit(_run_job, argv, cwd).result()
+            except BrokenProcessPool:
+                with pool_lock:
+                    if pools[0] is pool:  # Concurrent jobs on the same broken pool replace it once
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        pools[0] = start_pool()
+                if attempt:
+                    raise
+    
+    class JobHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                job = json.loads(self.rfile.readline())
+                returncode, output = run(_job_argv(job), job.get("cwd", os.getcwd()))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                returncode, output = 2, f"Error: Invalid job: {e}\n"
+            except Exception as e:
+                returncode, output = 1, f"Error: {str(e) or type(e).__name__}\n"
+            reply = {"returncode": returncode, "output": output}
+            with contextlib.suppress(OSError):  # The client may be gone
+                self.wfile.write(json.dumps(reply).encode() + b"\n")
+    
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    
+    server = socketserver.ThreadingUnixStreamServer(socket_path, JobHandler)
+    print(f"Serving image_edit jobs on {socket_path} with {workers} workers", flush=True)
+    # Shut down cleanly (removing the socket) on SIGTERM as well as Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pools[0].shutdown()
+        os.unlink(socket_path)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env -S uv run
+# /// script
+# requires-python = ">=3.10"
+# dependencies = ["google-genai>=1.11.0", "pillow>=10.0.0"]
+# ///
+"""Benchmark the client-side overhead of generate_image.py against the local stub.
+
+Starts benchmarks/stub_server.py with the given latency and payload options, runs
+generate_image.py --profile-json in fresh interpreters and reports the median
+time per phase. Everything runs locally, so results are reproducible without
+network access; with --latency 0, upload_and_model is almost pure transfer.
+
+Usage:
+    uv run benchmarks/client_overhead.py --resolution 4K --runs 5
+    uv run benchmarks/client_overhead.py --input-image photo.jpg --stub-args="--noise --alpha"
+"""
+
+import argparse
+import json
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SCRIPT = BENCH_DIR.parent / "scripts" / "generate_image.py"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError(f"Stub server did not start on port {port}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generate_image.py client-side phases against a stub")
+    parser.add_argument("--runs", type=int, default=5, help="Runs; the median per phase is kept (default: 5)")
+    parser.add_argument("--resolution", default="1K", choices=["1K", "2K", "4K"], help="Requested resolution")
+    parser.add_argument("--input-image", help="Input image for edit requests")
+    parser.add_argument("--latency", type=float, default=0.0, help="Stub latency in seconds (default: 0)")
+    parser.add_argument("--stub-args", default="", help="Extra stub_server.py arguments, e.g. \"--noise --alpha\"")
+    parser.add_argument("--script-args", default="",
+                        help="Extra generate_image.py arguments, e.g. \"--no-upload-prep\"")
+    parser.add_argument("--output", "-o", help="Write the per-run reports and medians to this JSON file")
+    args = parser.parse_args()
+
+    port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR / "stub_server.py"), "--port", str(port), "--latency", str(args.latency),
+         "--quiet", *shlex.split(args.stub_args)],
+        stdout=subprocess.DEVNULL,
+    )
+    reports = []
+    try:
+        wait_for_port(port)
+        with tempfile.TemporaryDirectory() as tmp:
+            for run in range(args.runs):
+                profile = Path(tmp) / f"profile-{run}.json"
+                command = [sys.executable, str(SCRIPT), "--prompt", "benchmark", "--filename", f"{tmp}/out.png",
+                           "--resolution", args.resolution, "--api-key", "stub",
+                           "--base-url", f"http://127.0.0.1:{port}", "--no-cache", "--profile-json", str(profile),
+                           *shlex.split(args.script_args)]
+                if args.input_image:
+                    command += ["--input-image", args.input_image]
+                start = time.perf_counter()
+                subprocess.run(command, check=True, capture_output=True)
+                report = json.loads(profile.read_text())
+                report["process_ms"] = (time.perf_counter() - start) * 1000
+                reports.append(report)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    phases = {}
+    for report in reports:
+        for row in report["phases"]:
+            phases.setdefault(row["phase"], []).append(row["ms"])
+    medians = {name: statistics.median(values) for name, values in phases.items()}
+    medians["total (in script)"] = statistics.median(r["total_ms"] for r in reports)
+    medians["process (wall)"] = statistics.median(r["process_ms"] for r in reports)
+
+    print(f"{'phase':<20}{'median ms':>12}")
+    for name, value in medians.items():
+        print(f"{name:<20}{value:>12.1f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"runs": reports, "median_ms": medians}, indent=2))
+        print(f"\nResults: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env -S uv run
+# /// script
+# requires-python = ">=3.10"
+# dependencies = ["pillow"]
+# ///
+"""Local stand-in for the Gemini generate_content endpoint.
+
+Answers every `POST .../models/<model>:generateContent` with a text part and a
+PNG image part sized to the requested imageSize, after a configurable latency.
+Payload size is configurable: --side overrides the image size, --noise makes the
+PNG nearly incompressible (the worst-case payload) and --alpha
+returns RGBA to exercise the compositing path. A fraction of requests can fail
+with 429 or 503 to exercise retries, or be slowed to --slow-latency to exercise
+hedging. Point generate_image.py at it with
+--base-url (any API key is accepted).
+
+Usage:
+    uv run benchmarks/stub_server.py --port 8765 --latency 2 --fail-rate 0.1
+    uv run benchmarks/stub_server.py --latency 0 --noise --alpha
+    uv run benchmarks/stub_server.py --latency 1 --slow-rate 0.05 --slow-latency 20
+    uv run scripts/generate_image.py --batch jobs.jsonl --base-url http://127.0.0.1:8765 --api-key stub
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+# Longest side of the returned image per requested imageSize
+SIZES = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+_payloads = {}
+_payloads_lock = threading.Lock()
+
+
+def image_payload(image_size: str, options: argparse.Namespace) -> str:
+    """Base64 PNG for an imageSize, built once per size.
+
+    The default gradient compresses like a flat render; noise is the worst case.
+    """
+    with _payloads_lock:
+        if image_size not in _payloads:
+            side = options.side or SIZES.get(image_size, 1024)
+            mode = "RGBA" if options.alpha else "RGB"
+            if options.noise:
+                img = Image.frombytes(mode, (side, side), os.urandom(side * side * len(mode)))
+            else:
+                img = Image.linear_gradient("L").resize((side, side)).convert(mode)
+            buffer = io.BytesIO()
+            img.save(buffer, format="PNG")
+            _payloads[image_size] = base64.b64encode(buffer.getvalue()).decode()
+        return _payloads[image_size]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = None  # argparse.Namespace, set by main
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if ":generateContent" not in self.path:
+            self._send(404, {"error": {"code": 404, "message": f"Unknown path {self.path}", "status": "NOT_FOUND"}})
+            return
+
+        latency = self.options.slow_latency if random.random() < self.options.slow_rate else self.options.latency
+        time.sleep(max(0.0, random.gauss(latency, self.options.jitter)))
+        if random.random() < self.options.fail_rate:
+            code, status = random.choice([(429, "RESOURCE_EXHAUSTED"), (503, "UNAVAILABLE")])
+            self._send(code, {"error": {"code": code, "message": "Injected stub failure", "status": status}})
+            return
+
+        image_size = body.get("generationConfig", {}).get("imageConfig", {}).get("imageSize", "1K")
+        self._send(200, {
+            "candidates": [{
+                "content": {
+                    "role": "model",
+                    "parts": [
+                        {"text": f"Stub image ({image_size})"},
+                        {"inlineData": {"mimeType": "image/png", "data": image_payload(image_size, self.options)}},
+                    ],
+                },
+                "finishReason": "STOP",
+            }],
+        })
+
+    def _send(self, code: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.options.quiet:
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the Gemini generate_content endpoint")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port (default: 8765)")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mean response latency in seconds (default: 1)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latency standard deviation in seconds (default: 0)")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 429 or 503 (default: 0)")
+    parser.add_argument("--slow-rate", type=float, default=0.0,
+                        help="Fraction of requests answered after --slow-latency instead (default: 0)")
+    parser.add_argument("--slow-latency", type=float, default=30.0,
+                        help="Latency of slow requests in seconds (default: 30)")
+    parser.add_argument("--side", type=int, help="Returned image side in pixels (default: from imageSize)")
+    parser.add_argument("--noise", action="store_true", help="Return random noise (largest PNG payload)")
+    parser.add_argument("--alpha", action="store_true", help="Return an RGBA image")
+    parser.add_argument("--quiet", "-q", action="store_true", help="Don't log requests")
+    args = parser.parse_args()
+
+    StubHandler.options = args
+    ThreadingHTTPServer.request_queue_size = 256  # The default backlog of 5 resets bursts of concurrent clients
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    print(f"Stub generate_content server on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
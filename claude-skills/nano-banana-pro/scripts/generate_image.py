@@ -2,8 +2,8 @@
 # /// script
 # requires-python = ">=3.10"
 # dependencies = [
-#     "google-genai>=1.0.0",
-#     "pillow>=10.0.0",
+#     "google-genai>=1.11.0",
+#     "pillow>=10.1.0",
 # ]
 # ///
 """
@@ -11,13 +11,108 @@ Generate images using Google's Nano Banana Pro (Gemini 3 Pro Image) API.
 
 Usage:
     uv run generate_image.py --prompt "your image description" --filename "output.png" [--resolution 1K|2K|4K] [--api-key KEY]
+    uv run generate_image.py --batch jobs.jsonl [--concurrency 8] [--rate 2] [--api-key KEY]
 """
 
 import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
 import os
+import random
+import shlex
 import sys
+import threading
+import time
 from pathlib import Path
 
+MODEL = "gemini-3-pro-image-preview"
+
+# Batch retry policy: rate limiting and server errors are retried with
+# exponential backoff and full jitter; other errors fail the job immediately
+RETRY_INITIAL_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+# image_edit.py from the basic-image-editing skill, installed alongside this one
+IMAGE_EDIT_DIR = Path(__file__).resolve().parents[2] / "basic-image-editing" / "scripts"
+
+# image_edit flags that --edit accepts: the operation chain and its size target
+EDIT_OPTIONS = {
+    "rotate", "flip", "width", "height", "remove_transparency", "replace_transparency", "pad", "pad_color",
+    "pad_edge", "crop", "max_size", "grayscale", "mask", "autocrop_transparency", "threads",
+}
+
+# Hedging: until this many latencies are recorded for a resolution, duplicates
+# are sent after HEDGE_DEFAULT_DEADLINE seconds instead of a percentile
+HEDGE_MIN_SAMPLES = 10
+HEDGE_DEFAULT_DEADLINE = 45.0
+HEDGE_MAX_SAMPLES = 200
+
+# Longest input side worth uploading for each output resolution; larger inputs are downscaled first
+UPLOAD_MAX_SIDE = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Per-request options a worker applies from the job; the thin client sends the ones set on its command line
+WORKER_JOB_OPTIONS = ("upload_format", "upload_quality", "no_upload_prep",
+                      "hedge", "hedge_percentile", "hedge_after", "hedge_budget")
+
+# Options a worker can't apply per job (its client, cache and history are fixed at startup,
+# and profiling covers this process); requests that set them run locally
+LOCAL_ONLY_OPTIONS = ("api_key", "base_url", "cache_dir", "cache_size", "cache_max_age", "hedge_history",
+                      "profile", "profile_json")
+
+# Bump when the cached entry layout or request shape changes so stale entries are never served
+CACHE_VERSION = 1
+
+
+class PhaseTimer:
+    """Wall time per request phase for --profile.
+
+    Phases with the same name add up (e.g. retried requests). A disabled timer
+    records nothing.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.phases = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        if self.enabled:
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def report(self) -> dict:
+        return {
+            "phases": [{"phase": name, "ms": round(seconds * 1000, 3)} for name, seconds in self.phases.items()],
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+        }
+
+    def print_table(self):
+        report = self.report()
+        print(f"\n{'phase':<18}{'ms':>10}")
+        for row in report["phases"]:
+            print(f"{row['phase']:<18}{row['ms']:>10.1f}")
+        print(f"{'total':<18}{report['total_ms']:>10.1f}")
+
+
+# Replaced by main when profiling; disabled otherwise
+_timer = PhaseTimer()
+
 
 def get_api_key(provided_key: str | None) -> str | None:
     """Get API key from argument first, then environment."""
@@ -26,142 +121,1095 @@ def get_api_key(provided_key: str | None) -> str | None:
     return os.environ.get("GEMINI_API_KEY")
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Generate images using Nano Banana Pro (Gemini 3 Pro Image)"
-    )
-    parser.add_argument(
-        "--prompt", "-p",
-        required=True,
-        help="Image description/prompt"
-    )
-    parser.add_argument(
-        "--filename", "-f",
-        required=True,
-        help="Output filename (e.g., sunset-mountains.png)"
-    )
-    parser.add_argument(
-        "--input-image", "-i",
-        help="Optional input image path for editing/modification"
-    )
-    parser.add_argument(
-        "--resolution", "-r",
-        choices=["1K", "2K", "4K"],
-        default="1K",
-        help="Output resolution: 1K (default), 2K, or 4K"
-    )
-    parser.add_argument(
-        "--api-key", "-k",
-        help="Gemini API key (overrides GEMINI_API_KEY env var)"
-    )
+def create_client(api_key: str, base_url: str | None = None, event_hooks: dict | None = None):
+    """Create a genai client, optionally pointed at another endpoint (e.g. a local stub server).
 
-    args = parser.parse_args()
+    event_hooks are passed to the underlying (sync) httpx client.
+    """
+    from google import genai
+    from google.genai import types
 
-    # Get API key
-    api_key = get_api_key(args.api_key)
-    if not api_key:
-        print("Error: No API key provided.", file=sys.stderr)
-        print("Please either:", file=sys.stderr)
-        print("  1. Provide --api-key argument", file=sys.stderr)
-        print("  2. Set GEMINI_API_KEY environment variable", file=sys.stderr)
-        sys.exit(1)
+    http_options = None
+    if base_url or event_hooks:
+        http_options = types.HttpOptions(base_url=base_url,
+                                         client_args={"event_hooks": event_hooks} if event_hooks else None)
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+def auto_resolution(image) -> str:
+    """Map an input image's size to the closest output resolution."""
+    max_dim = max(image.size)
+    if max_dim >= 3000:
+        return "4K"
+    elif max_dim >= 1500:
+        return "2K"
+    return "1K"
+
+
+def format_size(num_bytes: int) -> str:
+    """Human-readable byte count."""
+    if num_bytes >= 1024 * 1024:
+        return f"{num_bytes / (1024 * 1024):.2f} MB"
+    elif num_bytes >= 1024:
+        return f"{num_bytes / 1024:.1f} KB"
+    return f"{num_bytes} bytes"
+
+
+def prepare_upload(image, path: str, resolution: str, upload_format: str = "JPEG", quality: int = 90,
+                   log=print):
+    """Downscale an input image to the longest side the resolution needs and encode it compactly.
+
+    Images without transparency become quality-controlled JPEG or WebP; images with
+    transparency stay lossless PNG. A JPEG/WebP file that already fits is uploaded
+    as-is. Large JPEGs are decoded at reduced scale (Pillow's draft mode), so a
+    48 MP photo is never fully decoded. image must not have been loaded yet.
+
+    Returns:
+        A types.Part holding the encoded upload
+    """
+    from io import BytesIO
 
-    # Import here after checking API key to avoid slow import on error
-    from google import genai
     from google.genai import types
     from PIL import Image as PILImage
+    from PIL import ImageOps
+
+    original_size, original_bytes = image.size, os.path.getsize(path)
+    max_side = UPLOAD_MAX_SIDE[resolution]
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    rotated = image.getexif().get(0x0112, 1) != 1  # EXIF orientation
+
+    if image.format in ("JPEG", "WEBP") and max(image.size) <= max_side and not rotated:
+        data, mime_type = Path(path).read_bytes(), PILImage.MIME[image.format]
+    else:
+        image.thumbnail((max_side, max_side), PILImage.Resampling.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+        buffer = BytesIO()
+        if has_alpha:
+            image.convert("RGBA").save(buffer, "PNG")
+            mime_type = "image/png"
+        else:
+            image = image if image.mode in ("RGB", "L") else image.convert("RGB")
+            image.save(buffer, upload_format, quality=quality)
+            mime_type = PILImage.MIME[upload_format]
+        data = buffer.getvalue()
+
+    saved = original_bytes - len(data)
+    log(f"Prepared upload: {original_size[0]}x{original_size[1]} -> {image.size[0]}x{image.size[1]} "
+        f"{mime_type}, {format_size(original_bytes)} -> {format_size(len(data))}"
+        + (f" ({format_size(saved)} saved)" if saved > 0 else ""))
+    return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+
+def build_request(prompt: str, input_image, resolution: str) -> tuple:
+    """Build generate_content contents (image first if editing) and config."""
+    from google.genai import types
+
+    contents = [input_image, prompt] if input_image else prompt
+    config = types.GenerateContentConfig(
+        response_modalities=["TEXT", "IMAGE"],
+        image_config=types.ImageConfig(
+            image_size=resolution
+        )
+    )
+    return contents, config
+
+
+def response_parts(response) -> tuple[list[str], list[tuple[str, bytes]]]:
+    """Text parts and (mime_type, bytes) image parts of a generate_content response."""
+    texts, images = [], []
+    for part in response.parts or []:
+        if part.text is not None:
+            texts.append(part.text)
+        elif part.inline_data is not None:
+            # inline_data.data is already bytes, not base64
+            image_data = part.inline_data.data
+            if isinstance(image_data, str):
+                # If it's a string, it might be base64
+                import base64
+                image_data = base64.b64decode(image_data)
+            images.append((part.inline_data.mime_type, image_data))
+    return texts, images
+
 
-    # Initialise client
-    client = genai.Client(api_key=api_key)
+def is_plain_png(mime_type: str | None, data: bytes) -> bool:
+    """True if data is an 8-bit RGB PNG (no alpha channel), judged from the MIME type and IHDR header.
+
+    Such payloads are exactly what the decode/convert/re-encode path would produce,
+    so they can be written as-is.
+    """
+    return (mime_type in (None, "image/png") and data[:8] == PNG_SIGNATURE and data[12:16] == b"IHDR"
+            and data[24] == 8 and data[25] == 2)  # bit depth 8, color type 2 (truecolor)
+
+
+def load_image_edit():
+    """Import image_edit.py from the basic-image-editing skill."""
+    if str(IMAGE_EDIT_DIR) not in sys.path:
+        sys.path.insert(0, str(IMAGE_EDIT_DIR))
+    try:
+        import image_edit
+    except ImportError as e:
+        raise ValueError(f"--edit needs the basic-image-editing skill next to this one ({IMAGE_EDIT_DIR}): {e}")
+    return image_edit
+
+
+def parse_edit(edit: str, output_path: Path, cwd: str | None = None) -> dict:
+    """Parse --edit (image_edit.py operation flags) into image_edit.edit() options.
+
+    The output format comes from the output filename's extension (PNG if unknown)
+    and a relative --mask path is resolved against cwd (default: the current
+    directory). Options, and the optional dependencies the chain actually uses
+    (see image_edit.optional_dependencies), are checked here, before any request is sent.
+    """
+    import importlib.util
+
+    image_edit = load_image_edit()
+    parser = image_edit.build_parser()
+    parser.exit_on_error = False
+
+    # -h/--help and some argparse errors exit even with exit_on_error=False; that
+    # must not end a batch or a worker, so every exit becomes a ValueError
+    def reject(status=0, message=None):
+        reason = (message or "").strip().removeprefix(f"{parser.prog}: error: ")
+        raise ValueError(f"Invalid --edit: {reason or 'help and other exiting options are not supported'}")
+
+    parser.exit = reject
+    parser.print_help = parser.print_usage = lambda file=None: None
+    try:
+        argv = shlex.split(edit)
+    except ValueError as e:  # Unbalanced quotes
+        raise ValueError(f"Invalid --edit: {e}")
+    try:
+        parsed, extra = parser.parse_known_args(argv)
+    except argparse.ArgumentError as e:
+        raise ValueError(f"Invalid --edit: {e}")
+    defaults = vars(parser.parse_args([]))
+    options = {key: value for key, value in vars(parsed).items() if value != defaults[key]}
+    unsupported = sorted(set(options) - EDIT_OPTIONS)
+    if extra or unsupported:
+        raise ValueError(f"Invalid --edit: unsupported arguments {' '.join(extra + unsupported)}")
+    if options.get("mask") and cwd:
+        options["mask"] = str(Path(cwd) / options["mask"])
+    try:
+        image_edit.validate_options(**options)
+    except ValueError as e:
+        raise ValueError(f"Invalid --edit: {e}")
+    if options.get("threads") == 0:
+        options["threads"] = os.cpu_count() or 1
+
+    output_format = image_edit.FORMAT_MAP.get(output_path.suffix.lower(), 'PNG')
+    modules = image_edit.optional_dependencies(output_format, **options)
+    missing = [module for module in modules if importlib.util.find_spec(module) is None]
+    if missing:
+        packages = " ".join(f"--with {module.replace('_', '-')}" for module in missing)
+        raise ValueError(f"--edit needs {' and '.join(missing)}; run with: uv run {packages} generate_image.py ...")
+    return {"output_format": output_format, **options}
+
+
+def save_edited(image_data: bytes, output_path: Path, edit: dict, log=print):
+    """Run the image_edit chain on a generated image in memory and encode it once, to the final format.
+
+    The model's image goes in as returned (alpha included), so
+    --edit="--remove-transparency" or --edit="--autocrop-transparency 5" see the real alpha.
+    """
+    image_edit = load_image_edit()
+    options = dict(edit)
+    output_format = options.pop("output_format")
+    with _timer.phase("edit_encode"):
+        data = image_edit.edit(image_data, output_format, **options)
+    with _timer.phase("write"):
+        output_path.write_bytes(data)
+    log(f"Edited and saved as {output_format} ({format_size(len(data))})")
+
+
+def save_parts(texts: list[str], images: list[tuple[str, bytes]], output_path: Path, log=print,
+               edit: dict | None = None) -> bool:
+    """Log text parts and save the image parts as PNG (or through edit, see parse_edit).
+
+    Returns False if there is no image.
+    """
+    for text in texts:
+        log(f"Model response: {text}")
+
+    image_saved = False
+    for mime_type, image_data in images:
+        if edit is not None:
+            save_edited(image_data, output_path, edit, log)
+            image_saved = True
+            continue
+
+        # Fast path: already an RGB PNG, so skip the decode and re-encode
+        if is_plain_png(mime_type, image_data):
+            with _timer.phase("write"):
+                output_path.write_bytes(image_data)
+            image_saved = True
+            continue
+
+        from io import BytesIO
+
+        from PIL import Image as PILImage
+
+        with _timer.phase("decode"):
+            image = PILImage.open(BytesIO(image_data))
+            image.load()
+
+        # Ensure RGB mode for PNG (convert RGBA to RGB with white background if needed)
+        with _timer.phase("composite"):
+            if image.mode == 'RGBA':
+                rgb_image = PILImage.new('RGB', image.size, (255, 255, 255))
+                rgb_image.paste(image, mask=image.split()[3])
+                image = rgb_image
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+        with _timer.phase("encode_save"):
+            image.save(str(output_path), 'PNG')
+        image_saved = True
+    return image_saved
+
+
+def cache_key(prompt: str, input_path: str | None, resolution: str, upload: list | None = None) -> str:
+    """Hash everything that shapes the request: model, prompt, input image bytes (and upload settings) and image_size."""
+    parts = [CACHE_VERSION, MODEL, prompt, resolution] + ([upload] if input_path and upload else [])
+    digest = hashlib.sha256(json.dumps(parts).encode())
+    if input_path:
+        with open(input_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_get(cache_dir: Path, key: str, max_age: float | None = None) -> tuple | None:
+    """Return cached (texts, images) for key, marking the entry as recently used.
+
+    Entries unused for more than max_age seconds are dropped instead.
+    """
+    path = cache_dir / key
+    try:
+        if max_age is not None and time.time() - path.stat().st_mtime > max_age:
+            path.unlink()
+            return None
+        data = path.read_bytes()
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+
+    # Layout: one JSON header line, then the image payloads back to back
+    header, _, payload = data.partition(b"\n")
+    header = json.loads(header)
+    images, offset = [], 0
+    for mime_type, size in header["images"]:
+        images.append((mime_type, payload[offset:offset + size]))
+        offset += size
+    return header["texts"], images
+
+
+def cache_put(cache_dir: Path, key: str, texts: list[str], images: list[tuple[str, bytes]],
+              max_bytes: int, max_age: float | None = None):
+    """Store a response under key, then evict expired and least recently used entries above max_bytes."""
+    header = {"texts": texts, "images": [[mime_type, len(data)] for mime_type, data in images]}
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_dir / f".{key}.{os.getpid()}.{os.urandom(4).hex()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(json.dumps(header).encode() + b"\n")
+        for _, data in images:
+            f.write(data)
+    os.replace(tmp_path, cache_dir / key)
+
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and not entry.name.startswith('.'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    now = time.time()
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes and (max_age is None or now - mtime <= max_age):
+            break
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        total -= size
+
+
+def upload_settings(args) -> dict | None:
+    """Input image upload preparation settings from CLI arguments, or None to upload originals."""
+    if args.no_upload_prep:
+        return None
+    return {"upload_format": args.upload_format.upper(), "quality": args.upload_quality}
+
+
+def hedge_settings(args, history: "LatencyHistory | None" = None) -> dict | None:
+    """Hedged-request settings from CLI arguments, or None when hedging is off.
+
+    The budget is shared (and spent) by every request in the run; a worker gives
+    each job its own copy (see handle_worker_job). history
+    reuses an already loaded latency history instead of reading --hedge-history.
+    """
+    if not args.hedge:
+        return None
+    return {
+        "after": args.hedge_after,
+        "percentile": args.hedge_percentile,
+        "budget": args.hedge_budget,
+        "history": history or LatencyHistory(Path(args.hedge_history).expanduser()),
+    }
+
+
+def cache_settings(args) -> dict | None:
+    """Response cache settings from CLI arguments, or None when caching is off or bypassed."""
+    cache_dir = args.cache_dir or os.environ.get("NANO_BANANA_CACHE_DIR")
+    if not cache_dir or args.no_cache:
+        return None
+    return {
+        "dir": Path(cache_dir),
+        "max_bytes": int(args.cache_size * 1024 * 1024),
+        "max_age": args.cache_max_age * 86400 if args.cache_max_age else None,
+        "refresh": args.refresh_cache,
+    }
+
+
+def parse_job(line: str) -> dict:
+    """Parse and validate one JSON job.
+
+    A job is an object with "prompt" and "filename", plus optional "input_image",
+    "resolution" (auto-detected from the input image if omitted, else 1K) and
+    "edit" (image_edit.py flags, see parse_edit).
+    """
+    try:
+        job = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON: {e}")
+    if not isinstance(job, dict) or not job.get("prompt") or not job.get("filename"):
+        raise ValueError("each job needs \"prompt\" and \"filename\"")
+    for key in ("prompt", "filename", "input_image", "edit", "cwd"):
+        if job.get(key) is not None and not isinstance(job[key], str):
+            raise ValueError(f"\"{key}\" must be a string")
+    if job.get("resolution", "1K") not in ("1K", "2K", "4K"):
+        raise ValueError("resolution must be 1K, 2K or 4K")
+    return job
+
+
+def job_options(job: dict) -> dict:
+    """Validate a worker job's per-request options (see WORKER_JOB_OPTIONS)."""
+    options = {key: job[key] for key in WORKER_JOB_OPTIONS if key in job}
+    if options.get("upload_format", "jpeg") not in ("jpeg", "webp"):
+        raise ValueError("upload_format must be jpeg or webp")
+    for key in ("upload_quality", "hedge_percentile", "hedge_after", "hedge_budget"):
+        if not isinstance(options.get(key, 0), (int, float)) or isinstance(options.get(key), bool):
+            raise ValueError(f"{key} must be a number")
+    return options
+
+
+def read_batch(path: Path) -> list[dict]:
+    """Read batch jobs (see parse_job) from a JSONL file, ignoring blank lines."""
+    jobs = []
+    for line_no, line in enumerate(path.read_text().splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            jobs.append(parse_job(line))
+        except ValueError as e:
+            raise ValueError(f"{path}:{line_no}: {e}")
+    return jobs
+
+
+class TokenBucket:
+    """Async token bucket allowing `rate` requests per second, in bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LatencyHistory:
+    """Recent successful request latencies per resolution, persisted as JSON, for hedging deadlines."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            self.samples = json.loads(path.read_text())
+        except (OSError, ValueError):
+            self.samples = {}
+
+    def deadline(self, resolution: str, percentile: float) -> float:
+        """The percentile of recorded latencies, or HEDGE_DEFAULT_DEADLINE with too few samples."""
+        samples = sorted(self.samples.get(resolution, []))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DEADLINE
+        return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+    def record(self, resolution: str, seconds: float):
+        samples = self.samples.setdefault(resolution, [])
+        samples.append(round(seconds, 3))
+        del samples[:-HEDGE_MAX_SAMPLES]
+        with contextlib.suppress(OSError):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(self.samples))
+            os.replace(tmp_path, self.path)
+
+
+async def generate_hedged(client, contents, config, resolution: str, hedge: dict,
+                          bucket: TokenBucket | None = None, log=print):
+    """Send a request, plus duplicates whenever no reply has arrived within the hedging deadline.
+
+    The first successful response wins and the other requests are cancelled.
+    Duplicates draw on hedge["budget"], shared by every request in the run (or worker job).
+    Raises the first error if every request fails.
+    """
+    async def attempt():
+        if bucket:
+            await bucket.acquire()
+        start = time.perf_counter()
+        response = await client.aio.models.generate_content(model=MODEL, contents=contents, config=config)
+        return response, time.perf_counter() - start
+
+    deadline = hedge["after"]
+    if deadline is None:
+        deadline = hedge["history"].deadline(resolution, hedge["percentile"])
+    pending = {asyncio.create_task(attempt())}
+    errors = []
+    try:
+        while pending:
+            timeout = deadline if hedge["budget"] > 0 else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    response, seconds = task.result()
+                    hedge["history"].record(resolution, seconds)
+                    return response
+                errors.append(task.exception())
+            if not done and hedge["budget"] > 0:
+                hedge["budget"] -= 1
+                log(f"No response after {deadline:.1f}s; sending a hedged duplicate request")
+                pending.add(asyncio.create_task(attempt()))
+        raise errors[0]
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for rate limiting (429) and server-side (5xx) API errors."""
+    from google.genai import errors
+
+    return isinstance(error, errors.APIError) and (error.code == 429 or error.code >= 500)
+
+
+async def generate_with_retry(client, contents, config, bucket: TokenBucket | None, retries: int,
+                              hedge: dict | None = None, resolution: str = "1K", log=print):
+    """Send one async generate_content request, retrying 429/5xx with exponential backoff.
+
+    With hedge settings, each attempt is hedged (see generate_hedged).
+    """
+    for attempt in range(retries + 1):
+        try:
+            if hedge:
+                return await generate_hedged(client, contents, config, resolution, hedge, bucket, log)
+            if bucket:
+                await bucket.acquire()
+            return await client.aio.models.generate_content(model=MODEL, contents=contents, config=config)
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_INITIAL_DELAY * 2 ** attempt))
+            log(f"Retrying in {delay:.1f}s after error {e.code} (attempt {attempt + 1}/{retries})")
+            await asyncio.sleep(delay)
+
+
+async def run_job(client, job: dict, semaphore: asyncio.Semaphore, bucket: TokenBucket | None,
+                  retries: int, cache: dict | None = None, upload: dict | None = None, log=None,
+                  hedge: dict | None = None) -> dict:
+    """Generate and save one batch job; failures are reported in the result, not raised.
+
+    Messages go to log (default: printed, prefixed with the output filename).
+    """
+    from PIL import Image as PILImage
+
+    output_path = Path(job["filename"])
+    log = log or (lambda message: print(f"{output_path}: {message}"))
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            input_image = None
+            resolution = job.get("resolution", "1K")
+            if job.get("input_image"):
+                input_image = await asyncio.to_thread(PILImage.open, job["input_image"])
+                if "resolution" not in job:
+                    resolution = auto_resolution(input_image)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            edit = parse_edit(job["edit"], output_path, job.get("cwd")) if job.get("edit") else None
+
+            key = None
+            if cache:
+                key = await asyncio.to_thread(cache_key, job["prompt"], job.get("input_image"), resolution,
+                                              upload and list(upload.values()))
+                cached = None if cache["refresh"] else await asyncio.to_thread(
+                    cache_get, cache["dir"], key, cache["max_age"])
+                if cached is not None:
+                    if not await asyncio.to_thread(save_parts, *cached, output_path, log, edit):
+                        raise ValueError("No image was generated in the response.")
+                    return {"filename": str(output_path), "ok": True, "cached": True,
+                            "seconds": time.perf_counter() - start}
+
+            if input_image and upload:
+                input_image = await asyncio.to_thread(prepare_upload, input_image, job["input_image"],
+                                                      resolution, log=log, **upload)
+            contents, config = build_request(job["prompt"], input_image, resolution)
+            response = await generate_with_retry(client, contents, config, bucket, retries, hedge, resolution, log)
+
+            texts, images = response_parts(response)
+            if not await asyncio.to_thread(save_parts, texts, images, output_path, log, edit):
+                raise ValueError("No image was generated in the response.")
+            if key:
+                await asyncio.to_thread(cache_put, cache["dir"], key, texts, images,
+                                        cache["max_bytes"], cache["max_age"])
+        except Exception as e:
+            return {"filename": str(output_path), "ok": False, "error": str(e) or type(e).__name__,
+                    "seconds": time.perf_counter() - start}
+        return {"filename": str(output_path), "ok": True, "seconds": time.perf_counter() - start}
+
+
+async def run_batch(client, jobs: list[dict], concurrency: int, rate: float | None, retries: int,
+                    cache: dict | None = None, upload: dict | None = None, hedge: dict | None = None) -> list[dict]:
+    """Run batch jobs concurrently, at most `concurrency` in flight and `rate` requests per second."""
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rate) if rate else None
+    tasks = [asyncio.create_task(run_job(client, job, semaphore, bucket, retries, cache, upload, hedge=hedge))
+             for job in jobs]
+
+    results = []
+    for done, task in enumerate(asyncio.as_completed(tasks), 1):
+        result = await task
+        if result["ok"]:
+            source = "cache hit" if result.get("cached") else f"{result['seconds']:.1f}s"
+            print(f"[{done}/{len(jobs)}] Saved: {result['filename']} ({source})")
+        else:
+            print(f"[{done}/{len(jobs)}] Error: {result['filename']}: {result['error']}", file=sys.stderr)
+        results.append(result)
+    return results
+
+
+def main_batch(args, api_key: str):
+    """Run a JSONL batch of generation jobs; exits non-zero if any job failed."""
+    try:
+        jobs = read_batch(Path(args.batch))
+    except (OSError, ValueError) as e:
+        print(f"Error reading batch file: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.edit:
+        jobs = [{"edit": args.edit, **job} for job in jobs]
+
+    client = create_client(api_key, args.base_url)
+    print(f"Generating {len(jobs)} images ({args.concurrency} concurrent)...")
+    start = time.perf_counter()
+    results = asyncio.run(run_batch(client, jobs, args.concurrency, args.rate, args.retries,
+                                    cache_settings(args), upload_settings(args), hedge_settings(args)))
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if not r["ok"]]
+    print(f"\nBatch complete: {len(results) - len(failed)}/{len(results)} images saved in {elapsed:.1f}s")
+    if failed:
+        sys.exit(1)
+
+
+async def handle_worker_job(client, line: str | bytes, semaphore: asyncio.Semaphore,
+                            bucket: TokenBucket | None, args, cache: dict | None,
+                            upload: dict | None, hedge: dict | None = None) -> dict:
+    """Run one worker job and build its reply {"id", "returncode", "output"}.
+
+    Jobs use the batch format (see parse_job) plus optional "cwd" (relative paths
+    are resolved against it), "id" (echoed back), "no_cache", "refresh_cache"
+    and the WORKER_JOB_OPTIONS, which override the worker's own (args) for this job.
+    Every job gets a reply, whatever goes wrong.
+    """
+    try:
+        job = parse_job(line)
+        options = job_options(job)
+    except ValueError as e:
+        raw = None
+        with contextlib.suppress(ValueError):
+            raw = json.loads(line)
+        job_id = raw.get("id") if isinstance(raw, dict) else None
+        return {"id": job_id, "returncode": 2, "output": f"Error: Invalid job: {e}\n"}
+
+    messages = []
+    try:
+        if options:
+            job_args = argparse.Namespace(**{**vars(args), **options})
+            upload = upload_settings(job_args)
+            hedge = hedge_settings(job_args, hedge and hedge["history"])
+        elif hedge:
+            hedge = {**hedge}  # A long-running worker would otherwise spend --hedge-budget once, for good
+
+        cwd = Path(job.get("cwd") or os.getcwd())
+        job["filename"] = str(cwd / job["filename"])
+        if job.get("input_image"):
+            job["input_image"] = str(cwd / job["input_image"])
+        if job.get("no_cache"):
+            cache = None
+        elif job.get("refresh_cache") and cache:
+            cache = {**cache, "refresh": True}
+
+        result = await run_job(client, job, semaphore, bucket, args.retries, cache, upload, log=messages.append,
+                               hedge=hedge)
+    except Exception as e:
+        result = {"ok": False, "error": str(e) or type(e).__name__}
+    if result["ok"]:
+        messages.append(f"\nImage saved: {Path(job['filename']).resolve()}")
+    else:
+        messages.append(f"Error generating image: {result['error']}")
+    return {"id": job.get("id"), "returncode": 0 if result["ok"] else 1, "output": "\n".join(messages) + "\n"}
+
+
+async def serve(args, api_key: str):
+    """Run a long-lived worker that keeps one warm client (and its connection pool).
+
+    With a socket path, jobs arrive one JSON line per Unix socket connection and
+    each gets one JSON reply line. With "-", jobs are read as JSON lines from
+    stdin and replies written to stdout as they complete (match them by "id").
+    Up to --concurrency jobs run at once.
+    """
+    import signal
+
+    from PIL import Image as PILImage  # noqa: F401 - imported once here rather than per job
+
+    client = create_client(api_key, args.base_url)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    bucket = TokenBucket(args.rate) if args.rate else None
+    settings = (args, cache_settings(args), upload_settings(args), hedge_settings(args))
+
+    if args.serve == "-":
+        loop = asyncio.get_running_loop()
+        tasks = set()
+
+        def reply(task):
+            tasks.discard(task)
+            sys.stdout.write(json.dumps(task.result()) + "\n")
+            sys.stdout.flush()
+
+        print("Reading generate_image jobs from stdin", file=sys.stderr, flush=True)
+        while line := await loop.run_in_executor(None, sys.stdin.readline):
+            if line.strip():
+                task = asyncio.create_task(handle_worker_job(client, line, semaphore, bucket, *settings))
+                tasks.add(task)
+                task.add_done_callback(reply)
+        if tasks:
+            await asyncio.wait(tasks)
+        return
+
+    async def on_connect(reader, writer):
+        try:
+            try:
+                line = await reader.readline()
+            except ValueError as e:  # Longer than the stream limit
+                result = {"id": None, "returncode": 2, "output": f"Error: Invalid job: {e}\n"}
+            else:
+                result = await handle_worker_job(client, line, semaphore, bucket, *settings)
+            writer.write(json.dumps(result).encode() + b"\n")
+            await writer.drain()
+        except OSError:
+            pass  # The client went away
+        finally:
+            writer.close()
+
+    socket_path = args.serve
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    # Shut down cleanly (removing the socket) on SIGTERM as well as Ctrl+C
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    server = await asyncio.start_unix_server(on_connect, path=socket_path)
+    print(f"Serving generate_image jobs on {socket_path} ({args.concurrency} concurrent)", flush=True)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        os.unlink(socket_path)
+
+
+def submit_job(socket_path: str, job: dict) -> int | None:
+    """Send a job to a worker and print its output.
+
+    Returns:
+        The job's exit code, or None if no worker is listening on socket_path
+        or it sent no valid reply.
+    """
+    import socket
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return None
+
+    try:
+        with client, client.makefile("rwb") as stream:
+            stream.write(json.dumps({**job, "cwd": os.getcwd()}).encode() + b"\n")
+            stream.flush()
+            reply = json.loads(stream.readline())
+        output, returncode = reply["output"], reply["returncode"]
+    except (OSError, ValueError, TypeError, KeyError):
+        return None  # No usable reply (e.g. the worker is shutting down): run locally
+
+    print(output, end="", file=sys.stderr if returncode else sys.stdout)
+    return returncode
+
+
+def generate_single(args, api_key: str):
+    """Generate (or edit) one image as described by the CLI arguments."""
+    # Import here after checking API key to avoid slow import on error
+    with _timer.phase("import"):
+        from PIL import Image as PILImage
 
     # Set up output path
     output_path = Path(args.filename)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
+    # Validate the edit pipeline before spending a request on it
+    edit = None
+    if args.edit:
+        try:
+            edit = parse_edit(args.edit, output_path)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
     # Load input image if provided
     input_image = None
     output_resolution = args.resolution
     if args.input_image:
         try:
-            input_image = PILImage.open(args.input_image)
+            with _timer.phase("input_load"):
+                input_image = PILImage.open(args.input_image)
             print(f"Loaded input image: {args.input_image}")
 
             # Auto-detect resolution if not explicitly set by user
             if args.resolution == "1K":  # Default value
                 # Map input image size to resolution
                 width, height = input_image.size
-                max_dim = max(width, height)
-                if max_dim >= 3000:
-                    output_resolution = "4K"
-                elif max_dim >= 1500:
-                    output_resolution = "2K"
-                else:
-                    output_resolution = "1K"
+                output_resolution = auto_resolution(input_image)
                 print(f"Auto-detected resolution: {output_resolution} (from input {width}x{height})")
         except Exception as e:
             print(f"Error loading input image: {e}", file=sys.stderr)
             sys.exit(1)
 
+    # Serve repeated requests from the cache without creating a client
+    cache = cache_settings(args)
+    upload = upload_settings(args)
+    key = None
+    if cache:
+        with _timer.phase("cache_lookup"):
+            key = cache_key(args.prompt, args.input_image, output_resolution, upload and list(upload.values()))
+            cached = None if cache["refresh"] else cache_get(cache["dir"], key, cache["max_age"])
+        if cached is not None:
+            print(f"Cache hit: {key[:12]}")
+            if save_parts(*cached, output_path, edit=edit):
+                print(f"\nImage saved: {output_path.resolve()}")
+                return
+            print("Error: No image was generated in the response.", file=sys.stderr)
+            sys.exit(1)
+
+    with _timer.phase("import"):
+        from google import genai  # noqa: F401
+        from google.genai import types  # noqa: F401
+
+    # Initialise client; with --profile, httpx hooks split the call into request
+    # serialization, upload plus model time (until response headers) and download/parsing
+    marks = {}
+    event_hooks = None
+    if _timer.enabled:
+        event_hooks = {
+            "request": [lambda request: marks.__setitem__("request", time.perf_counter())],
+            "response": [lambda response: marks.__setitem__("response", time.perf_counter())],
+        }
+    with _timer.phase("client"):
+        client = create_client(api_key, args.base_url, event_hooks)
+
+    # Shrink the input to what the output resolution needs before upload
+    if input_image and upload:
+        try:
+            with _timer.phase("input_prepare"):
+                input_image = prepare_upload(input_image, args.input_image, output_resolution, **upload)
+        except Exception as e:
+            print(f"Error preparing input image: {e}", file=sys.stderr)
+            sys.exit(1)
+
     # Build contents (image first if editing, prompt only if generating)
+    contents, config = build_request(args.prompt, input_image, output_resolution)
     if input_image:
-        contents = [input_image, args.prompt]
         print(f"Editing image with resolution {output_resolution}...")
     else:
-        contents = args.prompt
         print(f"Generating image with resolution {output_resolution}...")
 
     try:
-        response = client.models.generate_content(
-            model="gemini-3-pro-image-preview",
-            contents=contents,
-            config=types.GenerateContentConfig(
-                response_modalities=["TEXT", "IMAGE"],
-                image_config=types.ImageConfig(
-                    image_size=output_resolution
-                )
+        call_start = time.perf_counter()
+        hedge = hedge_settings(args)
+        if hedge:
+            with _timer.phase("hedged_request"):
+                response = asyncio.run(generate_hedged(client, contents, config, output_resolution, hedge))
+        else:
+            response = client.models.generate_content(
+                model=MODEL,
+                contents=contents,
+                config=config
             )
-        )
-        
+        if marks:
+            _timer.add("request_build", marks["request"] - call_start)
+            _timer.add("upload_and_model", marks["response"] - marks["request"])
+            _timer.add("download_parse", time.perf_counter() - marks["response"])
+
         # Process response and convert to PNG
-        image_saved = False
-        for part in response.parts:
-            if part.text is not None:
-                print(f"Model response: {part.text}")
-            elif part.inline_data is not None:
-                # Convert inline data to PIL Image and save as PNG
-                from io import BytesIO
-
-                # inline_data.data is already bytes, not base64
-                image_data = part.inline_data.data
-                if isinstance(image_data, str):
-                    # If it's a string, it might be base64
-                    import base64
-                    image_data = base64.b64decode(image_data)
-
-                image = PILImage.open(BytesIO(image_data))
-
-                # Ensure RGB mode for PNG (convert RGBA to RGB with white background if needed)
-                if image.mode == 'RGBA':
-                    rgb_image = PILImage.new('RGB', image.size, (255, 255, 255))
-                    rgb_image.paste(image, mask=image.split()[3])
-                    rgb_image.save(str(output_path), 'PNG')
-                elif image.mode == 'RGB':
-                    image.save(str(output_path), 'PNG')
-                else:
-                    image.convert('RGB').save(str(output_path), 'PNG')
-                image_saved = True
-        
+        texts, images = response_parts(response)
+        image_saved = save_parts(texts, images, output_path, edit=edit)
+        if image_saved and key:
+            with _timer.phase("cache_store"):
+                cache_put(cache["dir"], key, texts, images, cache["max_bytes"], cache["max_age"])
+
         if image_saved:
             full_path = output_path.resolve()
             print(f"\nImage saved: {full_path}")
         else:
             print("Error: No image was generated in the response.", file=sys.stderr)
             sys.exit(1)
-            
+
     except Exception as e:
         print(f"Error generating image: {e}", file=sys.stderr)
         sys.exit(1)
 
 
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate images using Nano Banana Pro (Gemini 3 Pro Image)"
+    )
+    parser.add_argument(
+        "--prompt", "-p",
+        help="Image description/prompt (required unless using --batch)"
+    )
+    parser.add_argument(
+        "--filename", "-f",
+        help="Output filename (e.g., sunset-mountains.png; required unless using --batch)"
+    )
+    parser.add_argument(
+        "--input-image", "-i",
+        help="Optional input image path for editing/modification"
+    )
+    parser.add_argument(
+        "--resolution", "-r",
+        choices=["1K", "2K", "4K"],
+        default="1K",
+        help="Output resolution: 1K (default), 2K, or 4K"
+    )
+    parser.add_argument(
+        "--upload-format",
+        choices=["jpeg", "webp"],
+        default="jpeg",
+        help="Encoding for input images without transparency before upload (default: jpeg)"
+    )
+    parser.add_argument(
+        "--upload-quality",
+        type=int,
+        default=90,
+        help="JPEG/WebP quality for uploaded input images (default: 90)"
+    )
+    parser.add_argument(
+        "--no-upload-prep",
+        action="store_true",
+        help="Upload input images at full size instead of downscaling and re-encoding them"
+    )
+    parser.add_argument(
+        "--edit", "-e",
+        metavar="FLAGS",
+        help="Post-process in memory with image_edit.py operation flags, e.g. --edit=\"--width 800 --max-size 0.5\" "
+             "(use the = form, as the value starts with --); "
+             "the image is encoded once, in the format of the --filename extension"
+    )
+    parser.add_argument(
+        "--api-key", "-k",
+        help="Gemini API key (overrides GEMINI_API_KEY env var)"
+    )
+    parser.add_argument(
+        "--batch", "-b",
+        metavar="JSONL",
+        help="Generate every job in a JSONL file, one {\"prompt\", \"filename\", "
+             "\"input_image\"?, \"resolution\"?} object per line"
+    )
+    parser.add_argument(
+        "--concurrency", "-c",
+        type=int,
+        default=4,
+        help="Maximum batch requests in flight (default: 4)"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        metavar="PER_SECOND",
+        help="Maximum batch requests started per second, including retries (default: unlimited)"
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=5,
+        help="Retries per batch job on rate limiting (429) and server (5xx) errors (default: 5)"
+    )
+    parser.add_argument(
+        "--base-url",
+        default=os.environ.get("GEMINI_BASE_URL"),
+        help="API endpoint override, e.g. a local stub server (default: GEMINI_BASE_URL env var)"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="Cache responses in DIR, keyed on model, prompt, input image and resolution "
+             "(default: NANO_BANANA_CACHE_DIR env var, off if unset)"
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=float,
+        default=1024,
+        metavar="MB",
+        help="Maximum cache size before least recently used entries are evicted (default: 1024)"
+    )
+    parser.add_argument(
+        "--cache-max-age",
+        type=float,
+        metavar="DAYS",
+        help="Drop cache entries unused for this many days (default: no limit)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the cache: neither read nor store responses"
+    )
+    parser.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="Ignore cached responses but store the new one"
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="Send a duplicate request when a response is slower than usual and keep the first success"
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=95,
+        help="Hedge after this percentile of recent latencies for the resolution (default: 95)"
+    )
+    parser.add_argument(
+        "--hedge-after",
+        type=float,
+        metavar="SECONDS",
+        help=f"Fixed hedging deadline instead of the percentile (which falls back to {HEDGE_DEFAULT_DEADLINE:g}s "
+             f"until {HEDGE_MIN_SAMPLES} latencies are recorded)"
+    )
+    parser.add_argument(
+        "--hedge-budget",
+        type=int,
+        default=2,
+        help="Maximum duplicate requests per run, across all batch jobs, or per job with --serve (default: 2)"
+    )
+    parser.add_argument(
+        "--hedge-history",
+        default="~/.cache/nano-banana-pro/latency.json",
+        metavar="FILE",
+        help="Where recent request latencies are kept (default: ~/.cache/nano-banana-pro/latency.json)"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print wall time per phase (imports, client, input, request, model, decode, save)"
+    )
+    parser.add_argument(
+        "--profile-json",
+        metavar="FILE",
+        help="Write the --profile report as JSON to FILE"
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        help="Run as a worker with a warm client, taking jobs on Unix socket SOCKET "
+             "('-' reads JSON jobs from stdin and writes replies to stdout)"
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="SOCKET",
+        help="Send the request to a worker (default: NANO_BANANA_SOCKET env var); "
+             "runs locally if no worker is listening"
+    )
+
+    args = parser.parse_args()
+
+    if not (args.batch or args.serve) and not (args.prompt and args.filename):
+        parser.error("--prompt and --filename are required unless using --batch or --serve")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.hedge_after is not None and args.hedge_after < 0:
+        parser.error("--hedge-after cannot be negative")
+
+    # Hand the request to a running worker if one is available (it has its own API key),
+    # unless it uses options the worker can't apply per job
+    socket_path = args.socket or os.environ.get("NANO_BANANA_SOCKET")
+    local_only = [key for key in LOCAL_ONLY_OPTIONS if getattr(args, key) != parser.get_default(key)]
+    if socket_path and not (args.batch or args.serve or local_only):
+        job = {"prompt": args.prompt, "filename": args.filename, "input_image": args.input_image,
+               "edit": args.edit, "no_cache": args.no_cache, "refresh_cache": args.refresh_cache}
+        if args.resolution != "1K":  # 1K is the default, which auto-detects from an input image
+            job["resolution"] = args.resolution
+        job.update({key: getattr(args, key) for key in WORKER_JOB_OPTIONS
+                    if getattr(args, key) != parser.get_default(key)})
+        returncode = submit_job(socket_path, job)
+        if returncode is not None:
+            sys.exit(returncode)
+
+    # Get API key
+    api_key = get_api_key(args.api_key)
+    if not api_key:
+        print("Error: No API key provided.", file=sys.stderr)
+        print("Please either:", file=sys.stderr)
+        print("  1. Provide --api-key argument", file=sys.stderr)
+        print("  2. Set GEMINI_API_KEY environment variable", file=sys.stderr)
+        sys.exit(1)
+
+    if args.serve:
+        try:
+            asyncio.run(serve(args, api_key))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.batch:
+        main_batch(args, api_key)
+        return
+
+    global _timer
+    _timer = PhaseTimer(enabled=bool(args.profile or args.profile_json))
+    try:
+        generate_single(args, api_key)
+    finally:
+        if args.profile:
+            _timer.print_table()
+        if args.profile_json:
+            Path(args.profile_json).write_text(json.dumps(_timer.report(), indent=2))
+
+
 if __name__ == "__main__":
     main()